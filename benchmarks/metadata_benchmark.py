@@ -0,0 +1,108 @@
+"""Compare extract_image_metadata against the former two-open version.
+
+Usage:
+    poetry run python benchmarks/metadata_benchmark.py [--runs N] [FILE ...]
+
+Without files, a large uncompressed TIFF and a JPEG with EXIF data are
+created in a temporary folder and removed afterwards.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+import exifread
+from PIL import Image
+
+from image_quality_sampler.GUI.utils.helpers import extract_image_metadata
+
+
+def legacy_extract_image_metadata(img_path):
+    metadata = {}
+
+    with Image.open(img_path) as img:
+        metadata["DPI"] = img.info.get("dpi", (None, None))
+        channels = len(img.getbands())
+        bits = getattr(img, "bits", 8)
+        metadata["Color depth"] = f"{bits * channels}bit {img.mode}"
+        metadata["File type"] = img.format
+        metadata[
+            "Size"
+        ] = f"{round(os.path.getsize(img_path) / (1024 * 1024), 2)} MB"
+        metadata["Filename"] = os.path.basename(img_path)
+
+    with open(img_path, "rb") as f:
+        exif_data = exifread.process_file(f)
+
+        exif_date = exif_data.get("EXIF DateTimeOriginal", None)
+        if exif_date:
+            metadata["Date Created"] = str(exif_date)
+        else:
+            creation_timestamp = os.path.getctime(img_path)
+            creation_date = datetime.datetime.fromtimestamp(creation_timestamp)
+            metadata["Date Created"] = creation_date.strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+
+        metadata["Creation method"] = str(
+            exif_data.get("Image Make", None)
+        ) or str(exif_data.get("Image Software", None))
+
+    return metadata
+
+
+def create_samples(folder):
+    # An A3 page at 600 dpi, as the archival scanners produce
+    image = Image.linear_gradient("L").resize((7000, 9900)).convert("RGB")
+    exif = Image.Exif()
+    exif[0x010F] = "Scanner Make"  # Make
+    exif[0x0131] = "Capture Software"  # Software
+    exif.get_ifd(0x8769)[0x9003] = "2024:01:02 03:04:05"  # DateTimeOriginal
+    tiff = os.path.join(folder, "page.tif")
+    image.save(tiff, dpi=(600, 600), tiffinfo={278: 8})
+    jpeg = os.path.join(folder, "page.jpg")
+    image.save(jpeg, dpi=(600, 600), exif=exif, quality=90)
+    return [tiff, jpeg]
+
+
+def timed(function, path, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = function(path)
+    return (time.perf_counter() - start) / runs, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    folder = None
+    files = args.files
+    if not files:
+        folder = tempfile.mkdtemp(prefix="metadata_benchmark_")
+        print(f"Creating sample images in {folder} ...")
+        files = create_samples(folder)
+    try:
+        for path in files:
+            size = os.path.getsize(path) / (1024 * 1024)
+            print(f"{os.path.basename(path)} ({size:.0f} MB)")
+            legacy, expected = timed(
+                legacy_extract_image_metadata, path, args.runs
+            )
+            fast, result = timed(extract_image_metadata, path, args.runs)
+            print(f"  {'two opens, all tags':<28}{legacy * 1000:>8.2f} ms")
+            print(f"  {'extract_image_metadata':<28}{fast * 1000:>8.2f} ms")
+            print(f"  {'speedup':<28}{legacy / fast:>8.1f}x")
+            if result != expected:
+                print(f"  output differs: {expected} != {result}")
+    finally:
+        if folder:
+            shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
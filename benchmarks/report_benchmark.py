@@ -0,0 +1,91 @@
+"""Reports per second, with and without a shared ReportEngine.
+
+Usage:
+    poetry run python benchmarks/report_benchmark.py [--reports N]
+
+The former behaviour, parsing the font and building the styles for
+every report, is timed against one engine rendering all of them. The
+PDFs are written to a temporary folder and removed afterwards.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from image_quality_sampler import config
+from image_quality_sampler.reports import visualize
+
+
+def make_session(number, checked=80, rejected=3):
+    images = [
+        f"/archive/BATCH{number}/doc{i // 20}/page_{i}.tif"
+        for i in range(checked)
+    ]
+    return {
+        "Batch Name": f"BATCH{number}",
+        "Lot": 1200,
+        "Documents": checked // 20,
+        "Sample": checked,
+        "Sampling Plan": rejected + 2,
+        "Checked Images": images,
+        "Rejected Images": [
+            (img, "Bad cropping") for img in images[:rejected]
+        ],
+        "Project": "Project",
+        "Location": "Location",
+        "User 1": "Inspector",
+        "User 2": "Contractor",
+    }
+
+
+def legacy_render(data, output):
+    # What every report used to pay before rendering
+    font_path = os.path.join(config.FONT_PATH, "DejaVuSans.ttf")
+    pdfmetrics.registerFont(TTFont(visualize.FONT_NAME, font_path))
+    visualize.ReportEngine().render(data, output)
+
+
+def timed(render_all):
+    start = time.perf_counter()
+    render_all()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=20)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="report_benchmark_")
+    sessions = [make_session(i) for i in range(args.reports)]
+    outputs = [
+        os.path.join(folder, f"report_{i}.pdf") for i in range(len(sessions))
+    ]
+    try:
+        # Warm up matplotlib and reportlab so neither run pays for imports
+        visualize.ReportEngine().render(sessions[0], outputs[0])
+
+        legacy = timed(
+            lambda: [
+                legacy_render(data, output)
+                for data, output in zip(sessions, outputs)
+            ]
+        )
+        engine = timed(
+            lambda: visualize.ReportEngine().render_many(sessions, outputs)
+        )
+        count = len(sessions)
+        print(f"{count} reports")
+        print(f"  {'setup per report':<24}{count / legacy:>8.2f} reports/s")
+        print(f"  {'one ReportEngine':<24}{count / engine:>8.2f} reports/s")
+        print(f"  {'speedup':<24}{legacy / engine:>8.2f}x")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
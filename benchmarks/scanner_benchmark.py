@@ -0,0 +1,96 @@
+"""Compare the scandir scanner against the former os.walk + mimetypes walk.
+
+Usage:
+    poetry run python benchmarks/scanner_benchmark.py [--files N] [--root P]
+
+Without --root a synthetic tree of N empty files (default 1,000,000) is
+created in a temporary folder and removed afterwards.
+"""
+import argparse
+import mimetypes
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from image_quality_sampler import scanner
+
+EXTENSIONS = [".tif", ".tif", ".tif", ".jpg", ".xml", ".txt"]
+
+
+def legacy_count(path):
+    total = 0
+    for _, _, files in os.walk(path):
+        for file in files:
+            mime_type, _ = mimetypes.guess_type(file)
+            if mime_type and mime_type.startswith("image"):
+                total += 1
+    return total
+
+
+def legacy_list(path):
+    all_images = []
+    for dirpath, _, filenames in os.walk(path):
+        for f in filenames:
+            full_path = os.path.join(dirpath, f)
+            mime_type, _ = mimetypes.guess_type(full_path)
+            if mime_type and mime_type.startswith("image/"):
+                all_images.append(full_path)
+    return all_images
+
+
+def create_tree(root, files, files_per_folder=250):
+    # BATCHxxx/docxxxx/page_xxxx.ext, like the scanning stations produce
+    rng = random.Random(0)
+    folders = max(files // files_per_folder, 1)
+    for folder in range(folders):
+        path = os.path.join(
+            root, f"BATCH{folder // 100:03d}", f"doc{folder:05d}"
+        )
+        os.makedirs(path)
+        for page in range(files_per_folder):
+            name = f"page_{page:04d}{rng.choice(EXTENSIONS)}"
+            open(os.path.join(path, name), "wb").close()
+
+
+def timed(label, function, path):
+    start = time.perf_counter()
+    result = function(path)
+    elapsed = time.perf_counter() - start
+    count = result if isinstance(result, int) else len(result)
+    print(f"{label:<32}{elapsed:>8.2f}s  {count} images")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--root", help="scan an existing tree instead")
+    args = parser.parse_args()
+
+    root = args.root
+    if not root:
+        root = tempfile.mkdtemp(prefix="scanner_benchmark_")
+        print(f"Creating {args.files} files in {root} ...")
+        create_tree(root, args.files)
+    try:
+        # Warm the OS directory cache so both sides see the same state
+        scanner.count_images(root)
+        legacy = timed("os.walk + mimetypes (count)", legacy_count, root)
+        fast = timed("scanner.count_images", scanner.count_images, root)
+        print(f"{'speedup':<32}{legacy / fast:>8.1f}x")
+        legacy = timed("os.walk + mimetypes (list)", legacy_list, root)
+        fast = timed(
+            "scanner.iter_images",
+            lambda path: list(scanner.iter_images(path)),
+            root,
+        )
+        print(f"{'speedup':<32}{legacy / fast:>8.1f}x")
+    finally:
+        if not args.root:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,10 +17,7 @@ from PyQt5.QtWidgets import (
     QWidget,
 )
 
-from image_quality_sampler.GUI.utils.helpers import SamplingPlan
-from image_quality_sampler.GUI.views.image_sampling_view import (
-    ImageSamplingView,
-)
+from image_quality_sampler import sampling_plan
 
 
 class BatchSelectionDialog(QDialog):
@@ -321,13 +318,12 @@ class BatchSelectionDialog(QDialog):
             # If no batch is selected, return
             return
 
-        # Use the SamplingPlan class to determine sample size and acceptance
-        self.sampling_plan = SamplingPlan()
+        # Look up sample size and acceptance in the shared plan tables
         (
             self.sample_size,
             self.accepted,
             self.rejected,
-        ) = self.sampling_plan.get_sample_size_and_acceptance(
+        ) = sampling_plan.get_sample_size_and_acceptance(
             self.lot_size, inspection_level, aql
         )
 
@@ -386,6 +382,10 @@ class BatchSelectionDialog(QDialog):
         return True
 
     def start_sampling(self):
+        from image_quality_sampler.GUI.views.image_sampling_view import (
+            ImageSamplingView,
+        )
+
         selected_batch = self.batch_dropdown.currentText()
         root_path = self.db.get_configuration()[2]
         folder_path = os.path.join(root_path, selected_batch)
@@ -0,0 +1,290 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from PyQt5.QtGui import QImage
+
+from image_quality_sampler import config
+
+QIMAGE_FORMATS = {
+    "L": QImage.Format_Grayscale8,
+    "RGB": QImage.Format_RGB888,
+    "RGBA": QImage.Format_RGBA8888,
+}
+
+
+def decode_image(path):
+    # QImage, unlike QPixmap, may be created outside the GUI thread
+    return QImage(path)
+
+
+def to_qimage(image):
+    if image.mode not in QIMAGE_FORMATS:
+        if image.mode == "1" or image.mode.startswith("I"):
+            image = image.convert("L")
+        elif "A" in image.getbands() or "transparency" in image.info:
+            image = image.convert("RGBA")
+        else:
+            image = image.convert("RGB")
+    bytes_per_line = image.width * len(image.getbands())
+    qimage = QImage(
+        image.tobytes(),
+        image.width,
+        image.height,
+        bytes_per_line,
+        QIMAGE_FORMATS[image.mode],
+    )
+    # Detach from the Python buffer
+    return qimage.copy()
+
+
+def read_image_size(path):
+    # Only parses the header
+    with Image.open(path) as image:
+        return image.size
+
+
+def is_single_block(path):
+    # Stored as one block (JPEG, compressed TIFF), any region of it can
+    # only be decoded by decoding the whole image
+    with Image.open(path) as image:
+        return len(image.tile) < 2
+
+
+def fit_size(size, max_size):
+    scale = min(max_size[0] / size[0], max_size[1] / size[1], 1)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def select_pyramid_level(image, size):
+    # Reduced resolution pages of a TIFF pyramid keep the aspect ratio
+    # of the full image, pick the smallest one still large enough
+    width, height = image.size
+    level, level_width = 0, width
+    for frame in range(1, getattr(image, "n_frames", 1)):
+        image.seek(frame)
+        frame_width, frame_height = image.size
+        if frame_width < size[0] or frame_height < size[1]:
+            continue
+        if abs(frame_width * height - frame_height * width) > width + height:
+            continue  # Not the same aspect ratio, give or take a pixel
+        if frame_width < level_width:
+            level, level_width = frame, frame_width
+    image.seek(level)
+    return level
+
+
+def move_tile(tile, extents):
+    # Tiles are named tuples from Pillow 11 on, plain tuples before
+    if hasattr(tile, "_replace"):
+        return tile._replace(extents=extents)
+    return (tile[0], extents, *tile[2:])
+
+
+def restrict_to_region(image, box):
+    # Keep only the strips or tiles overlapping the box, so loading
+    # decodes just those, and return the box in the smaller image
+    tiles = [
+        tile
+        for tile in image.tile
+        if tile[1][0] < box[2]
+        and tile[1][2] > box[0]
+        and tile[1][1] < box[3]
+        and tile[1][3] > box[1]
+    ]
+    if len(image.tile) < 2 or not tiles:
+        return box  # A single block, the whole image is decoded
+    left = min(tile[1][0] for tile in tiles)
+    top = min(tile[1][1] for tile in tiles)
+    right = max(tile[1][2] for tile in tiles)
+    bottom = max(tile[1][3] for tile in tiles)
+    image.tile = [
+        move_tile(
+            tile,
+            (
+                tile[1][0] - left,
+                tile[1][1] - top,
+                tile[1][2] - left,
+                tile[1][3] - top,
+            ),
+        )
+        for tile in tiles
+    ]
+    image._size = (right - left, bottom - top)
+    return (box[0] - left, box[1] - top, box[2] - left, box[3] - top)
+
+
+def smoothly_resizable(image):
+    # Bilevel and palette images would only be resized nearest neighbor
+    if image.mode == "1":
+        return image.convert("L")
+    if image.mode == "P":
+        return image.convert("RGBA")
+    return image
+
+
+def decode_region(path, box, frame=0):
+    with Image.open(path) as image:
+        image.seek(frame)
+        return image.crop(restrict_to_region(image, box))
+
+
+def decode_full_image(path):
+    with Image.open(path) as image:
+        image.load()
+    return image
+
+
+def crop_tiles(path, boxes, image=None):
+    """Decodes the ``boxes`` of ``path`` as QImages, by the same keys.
+
+    The region covering all of them is decoded in one go, unless the
+    already decoded ``image`` is given to crop them from.
+    """
+    left = top = 0
+    if image is None:
+        left = min(box[0] for box in boxes.values())
+        top = min(box[1] for box in boxes.values())
+        right = max(box[2] for box in boxes.values())
+        bottom = max(box[3] for box in boxes.values())
+        image = decode_region(path, (left, top, right, bottom))
+    return {
+        key: to_qimage(
+            image.crop(
+                (box[0] - left, box[1] - top, box[2] - left, box[3] - top)
+            )
+        )
+        for key, box in boxes.items()
+    }
+
+
+def decode_preview(path, max_size):
+    """Decodes ``path`` scaled down to fit ``max_size``, as a QImage.
+
+    TIFF pyramids are read from the closest level, striped and tiled
+    images one band of strips at a time so the full bitmap is never in
+    memory, and JPEGs are scaled by the decoder in draft mode.
+    """
+    with Image.open(path) as image:
+        frame = 0
+        if image.format == "TIFF":
+            frame = select_pyramid_level(image, fit_size(image.size, max_size))
+        full_size = image.size
+        size = fit_size(full_size, max_size)
+        if len(image.tile) < 2 or size == full_size:
+            image.draft(None, size)
+            image = smoothly_resizable(image)
+            image.thumbnail(size)
+            return to_qimage(image)
+    preview = None
+    band = config.IMAGE_TILE_SIZE
+    for top in range(0, full_size[1], band):
+        bottom = min(top + band, full_size[1])
+        rows = smoothly_resizable(
+            decode_region(path, (0, top, full_size[0], bottom), frame)
+        )
+        start = top * size[1] // full_size[1]
+        stop = bottom * size[1] // full_size[1]
+        if preview is None:
+            preview = Image.new(rows.mode, size)
+        if stop > start:
+            preview.paste(rows.resize((size[0], stop - start)), (0, start))
+    return to_qimage(preview)
+
+
+class ImageLoader:
+    """Decodes the sampled images ahead of the one being inspected.
+
+    ``get(index)`` returns the decoded image for ``paths[index]`` and
+    queues the next ``prefetch_count`` ones on worker threads. Decoded
+    images wait in a cache holding at most ``max_bytes``; when it is
+    full the images furthest ahead are dropped and decoded again once
+    they are needed.
+    """
+
+    def __init__(
+        self,
+        paths,
+        prefetch_count=config.IMAGE_PREFETCH_COUNT,
+        max_bytes=config.IMAGE_CACHE_BYTES,
+        workers=config.IMAGE_LOADER_WORKERS,
+        decode=decode_image,
+    ):
+        self.paths = list(paths)
+        self.prefetch_count = prefetch_count
+        self.max_bytes = max_bytes
+        self.decode = decode
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        # Decoded images and pending decodes, by index
+        self.cache = {}
+        self.cache_bytes = 0
+        self.futures = {}
+
+    def get(self, index):
+        with self.lock:
+            image = self.cache.pop(index, None)
+            if image is not None:
+                self.cache_bytes -= image.sizeInBytes()
+            future = self.futures.pop(index, None)
+        if image is None:
+            if future is None or future.cancel():
+                # Not started yet, decode it right here
+                image = self.decode(self.paths[index])
+            else:
+                # Wait for the decode already under way
+                image = future.result()
+        self.prefetch(index)
+        return image
+
+    def prefetch(self, index):
+        with self.lock:
+            # Images behind the current one are never shown again
+            for old in [i for i in self.cache if i <= index]:
+                self.discard(old)
+            for old in [i for i in self.futures if i <= index]:
+                self.futures.pop(old).cancel()
+            stop = min(index + 1 + self.prefetch_count, len(self.paths))
+            submitted = {}
+            for ahead in range(index + 1, stop):
+                if ahead in self.cache or ahead in self.futures:
+                    continue
+                future = self.executor.submit(self.decode, self.paths[ahead])
+                self.futures[ahead] = submitted[ahead] = future
+        # Callbacks of finished futures run right away, so they are
+        # added once the lock is released
+        for ahead, future in submitted.items():
+            future.add_done_callback(
+                lambda future, ahead=ahead: self.store(ahead, future)
+            )
+
+    def submit(self, function, *args):
+        # Other decoding work for the current image, e.g. its tiles
+        return self.executor.submit(function, *args)
+
+    def store(self, index, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        image = future.result()
+        with self.lock:
+            if self.futures.get(index) is not future:
+                return  # Already taken by get() or no longer needed
+            del self.futures[index]
+            self.cache[index] = image
+            self.cache_bytes += image.sizeInBytes()
+            while self.cache_bytes > self.max_bytes and self.cache:
+                self.discard(max(self.cache))
+
+    def discard(self, index):
+        image = self.cache.pop(index, None)
+        if image is not None:
+            self.cache_bytes -= image.sizeInBytes()
+
+    def shutdown(self):
+        with self.lock:
+            for future in self.futures.values():
+                future.cancel()
+            self.futures.clear()
+            self.cache.clear()
+            self.cache_bytes = 0
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,40 @@
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class WatcherListener(QObject):
+    # Rows changed and names of removed batches
+    batches_changed = pyqtSignal(list, list)
+    # Every batch row, after a full scan
+    batches_reset = pyqtSignal(list)
+    # Startup time and memory reported by the watcher process
+    watcher_ready = pyqtSignal(dict)
+
+    def __init__(self, connection, parent=None):
+        super().__init__(parent)
+        self.connection = connection
+        # A plain daemon thread blocked in recv() costs nothing while
+        # idle and never holds up interpreter shutdown. Signals emitted
+        # from it are queued to the GUI thread.
+        self.thread = threading.Thread(target=self.listen, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def listen(self):
+        while True:
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                return  # The watcher process is gone
+            self.dispatch(message)
+
+    def dispatch(self, message):
+        kind = message[0]
+        if kind == "batches":
+            self.batches_changed.emit(list(message[1]), list(message[2]))
+        elif kind == "reset":
+            self.batches_reset.emit(list(message[1]))
+        elif kind == "ready":
+            self.watcher_ready.emit(dict(message[1]))
@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from image_quality_sampler import config
+from image_quality_sampler.reports import worker
+
+
+class ReportGenerator(QObject):
+    """Creates PDF reports in a worker process, off the GUI thread.
+
+    The worker is started on the first report and spawned, not forked,
+    so it starts from a clean interpreter without the GUI. Completion is
+    signalled from the executor's thread, Qt queues the signals to the
+    receivers in the GUI thread.
+    """
+
+    # Number of reports submitted and not finished yet
+    pending_changed = pyqtSignal(int)
+    # Batch name, sampling attempt and path of the report written
+    report_finished = pyqtSignal(str, int, str)
+    # Batch name and the error
+    report_failed = pyqtSignal(str, str)
+
+    def __init__(self, workers=config.REPORT_WORKERS, parent=None):
+        super().__init__(parent)
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+        self.futures = set()
+
+    def submit(self, data, output=None):
+        # Named in the reports directory unless an output is given. The
+        # directory is read here, the workers only see the defaults
+        if output is not None:
+            output = os.path.abspath(output)
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            future = self.executor.submit(
+                worker.create_report, data, output, config.REPORTS_DIR
+            )
+            self.futures.add(future)
+            pending = len(self.futures)
+        self.pending_changed.emit(pending)
+        batch_name = data["Batch Name"]
+        attempt = data.get("Attempt", 0)
+        future.add_done_callback(
+            lambda future: self.finished(batch_name, attempt, future)
+        )
+        return future
+
+    def finished(self, batch_name, attempt, future):
+        with self.lock:
+            self.futures.discard(future)
+            pending = len(self.futures)
+        if future.cancelled():
+            self.report_failed.emit(batch_name, "Cancelled")
+        elif future.exception() is not None:
+            self.report_failed.emit(batch_name, str(future.exception()))
+        else:
+            self.report_finished.emit(batch_name, attempt, future.result())
+        self.pending_changed.emit(pending)
+
+    def pending(self):
+        with self.lock:
+            return len(self.futures)
+
+    def shutdown(self, wait=True):
+        # Reports already submitted are finished first when waiting
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
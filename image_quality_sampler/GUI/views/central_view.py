@@ -1,45 +1,51 @@
 import os
 
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QBrush, QColor
+from PyQt5.QtCore import QSortFilterProxyModel, QTimer
 from PyQt5.QtWidgets import (
     QAction,
     QHBoxLayout,
     QHeaderView,
+    QLabel,
     QMainWindow,
     QMenu,
     QMenuBar,
     QMessageBox,
+    QProgressBar,
     QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QVBoxLayout,
     QWidget,
 )
 
-from image_quality_sampler.GUI.dialogs.batch_selection_dialog import (
-    BatchSelectionDialog,
-)
 from image_quality_sampler.GUI.dialogs.configuration_dialog import (
     ConfigurationDialog,
 )
+from image_quality_sampler.GUI.utils.report_generator import ReportGenerator
 from image_quality_sampler.GUI.widgets.table_widgets import (
-    NumericTableWidgetItem,
+    SORT_ROLE,
+    BatchTableModel,
 )
 
 
 class CentralView(QMainWindow):
-    def __init__(self, db):
+    def __init__(self, db, reader=None, listener=None):
         super().__init__()
         self.db = db
+        # Full refreshes go through a read-only connection if given
+        self.reader = reader or db
         # Window properties
         self.setWindowTitle("AMS Capture - Quality Control Interface")
         self.resize(800, 600)  # Default size
 
-        # Set up the QTimer
-        self.update_timer = QTimer(self)
-        self.update_timer.timeout.connect(self.update_view)
-        self.update_timer.start(10000)  # 10 seconds in milliseconds
+        if listener:
+            # The watcher pushes changed rows, no need to poll
+            listener.batches_changed.connect(self.apply_batch_changes)
+            listener.batches_reset.connect(self.reset_batches)
+        else:
+            # Set up the QTimer
+            self.update_timer = QTimer(self)
+            self.update_timer.timeout.connect(self.update_view)
+            self.update_timer.start(10000)  # 10 seconds in milliseconds
 
         # Create the menu bar
         self.create_menu_bar()
@@ -47,9 +53,22 @@ class CentralView(QMainWindow):
         # Create a layout for the main window
         layout = QVBoxLayout()
 
-        # Create a table widget for displaying batch data
-        self.tableWidget = QTableWidget(self)
-        layout.addWidget(self.tableWidget)
+        # Create a table view for displaying batch data, sorted through a
+        # proxy so updates keep the current sort order
+        self.batch_model = BatchTableModel(self)
+        self.proxy_model = QSortFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.batch_model)
+        self.proxy_model.setSortRole(SORT_ROLE)
+        self.tableView = QTableView(self)
+        self.tableView.setModel(self.proxy_model)
+        # Hide the grid
+        self.tableView.setShowGrid(False)
+        self.tableView.setSortingEnabled(True)
+        # Stretch the table columns to fill the available space
+        header = self.tableView.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Stretch)
+        header.setSortIndicatorShown(True)
+        layout.addWidget(self.tableView)
 
         btn_layout = QHBoxLayout()
 
@@ -72,6 +91,22 @@ class CentralView(QMainWindow):
         central_widget.setLayout(layout)
         self.setCentralWidget(central_widget)
 
+        # Reports are written in the background, the status bar shows
+        # how many are still being generated
+        self.report_generator = ReportGenerator(parent=self)
+        self.report_generator.pending_changed.connect(
+            self.show_report_progress
+        )
+        self.report_generator.report_finished.connect(self.report_finished)
+        self.report_generator.report_failed.connect(self.report_failed)
+        self.reportLabel = QLabel(self)
+        self.reportProgress = QProgressBar(self)
+        self.reportProgress.setRange(0, 0)  # Busy indicator
+        self.reportProgress.setMaximumWidth(150)
+        self.statusBar().addPermanentWidget(self.reportLabel)
+        self.statusBar().addPermanentWidget(self.reportProgress)
+        self.show_report_progress(0)
+
         # Automatically update the view on startup if a configuration exists
         if self.get_batch_folder():
             self.update_view()
@@ -98,6 +133,11 @@ class CentralView(QMainWindow):
         self.setMenuBar(menu_bar)
 
     def open_sampling_initialization_view(self):
+        # Imported on first use, it pulls in the sampling view
+        from image_quality_sampler.GUI.dialogs.batch_selection_dialog import (
+            BatchSelectionDialog,
+        )
+
         # Open the Sampling Initialization View
         self.sampling_init_view = BatchSelectionDialog(self.db, self)
         self.sampling_init_view.exec()
@@ -122,121 +162,39 @@ class CentralView(QMainWindow):
                 return None
         return batch_folder
 
-    def update_table(self, batch_data):
-        self.tableWidget.setRowCount(len(batch_data))
-        self.tableWidget.setColumnCount(5)  # Updated column count
-        self.tableWidget.setHorizontalHeaderLabels(
-            [
-                "Batch Name",
-                "Subfolder Count",
-                "Image Count",
-                "Sampling Attempts",
-                "Status",
-            ]
-        )
-        # Hide the grid
-        self.tableWidget.setShowGrid(False)
-        for row, data in enumerate(batch_data):
-            batch_name_item = QTableWidgetItem(data["batch_name"])
-            subfolder_count_item = NumericTableWidgetItem(
-                str(data["subfolder_count"])
-            )
-            image_count_item = NumericTableWidgetItem(str(data["image_count"]))
-            sampling_attempts_item = NumericTableWidgetItem(
-                data["sampling_attempts"]
-            )
-
-            status_item = QTableWidgetItem(data["status"])
-
-            # Make items non-editable
-            batch_name_item.setFlags(
-                batch_name_item.flags() & ~Qt.ItemIsEditable
-            )
-            subfolder_count_item.setFlags(
-                subfolder_count_item.flags() & ~Qt.ItemIsEditable
-            )
-            image_count_item.setFlags(
-                image_count_item.flags() & ~Qt.ItemIsEditable
-            )
-            # Make items non-editable
-            sampling_attempts_item.setFlags(
-                sampling_attempts_item.flags() & ~Qt.ItemIsEditable
-            )
-            status_item.setFlags(status_item.flags() & ~Qt.ItemIsEditable)
-
-            # Color rows based on status
-            if data["status"] == "REJECTED":
-                color = QColor("red")
-            elif data["status"] == "TEMP REJECTED":
-                color = QColor("yellow")
-            elif data["status"] == "PENDING":
-                color = QColor("cyan")
-            elif data["status"] == "PASSED":
-                color = QColor("green")
-            else:
-                color = QColor("white")  # default color
-
-            self.tableWidget.setItem(row, 0, batch_name_item)
-            self.tableWidget.setItem(row, 1, subfolder_count_item)
-            self.tableWidget.setItem(row, 2, image_count_item)
-            self.tableWidget.setItem(row, 3, sampling_attempts_item)
-            self.tableWidget.setItem(row, 4, status_item)
-
-            # Determine text color based on background color brightness
-            brightness = (
-                (color.red() * 0.299)
-                + (color.green() * 0.587)
-                + (color.blue() * 0.114)
-            )
-            if brightness > 127.5:  # This threshold can be adjusted
-                textColor = QColor("black")
-            else:
-                textColor = QColor("white")
-
-            for col in range(self.tableWidget.columnCount()):
-                self.tableWidget.item(row, col).setBackground(color)
-                self.tableWidget.item(row, col).setForeground(
-                    QBrush(textColor)
-                )
-            # Center the text in each cell
-            for col in range(self.tableWidget.columnCount()):
-                item = self.tableWidget.item(row, col)
-                item.setTextAlignment(Qt.AlignCenter)
+    def update_view(self):
+        self.reset_batches(self.reader.get_all_batches())
 
-        # Enable sorting
-        self.tableWidget.setSortingEnabled(True)
-        # Stretch the table columns to fill the available space
-        header = self.tableWidget.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.Stretch)
-        header.setSortIndicatorShown(True)
+    def reset_batches(self, batch_rows):
+        self.batch_model.reset_batches(batch_rows)
+        self.startSampleButton.setEnabled(self.batch_model.rowCount() > 0)
 
-    def update_view(self):
-        # Store the current sort order and column
-        current_sort_order = (
-            self.tableWidget.horizontalHeader().sortIndicatorOrder()
+    def apply_batch_changes(self, batch_rows, removed_batches):
+        self.batch_model.apply_batch_changes(batch_rows, removed_batches)
+        self.startSampleButton.setEnabled(self.batch_model.rowCount() > 0)
+
+    def generate_report(self, data):
+        return self.report_generator.submit(data)
+
+    def show_report_progress(self, pending):
+        self.reportLabel.setText(f"Generating reports: {pending}")
+        self.reportLabel.setVisible(pending > 0)
+        self.reportProgress.setVisible(pending > 0)
+
+    def report_finished(self, batch_name, attempt, path):
+        self.db.insert_report(batch_name, attempt, path)
+        self.statusBar().showMessage(
+            f"Report for {batch_name} saved to {path}", 10000
         )
-        current_sort_column = (
-            self.tableWidget.horizontalHeader().sortIndicatorSection()
+
+    def report_failed(self, batch_name, error):
+        QMessageBox.warning(
+            self,
+            "Report Failed",
+            f"The report for {batch_name} could not be created: {error}",
         )
-        # Temporarily disable sorting
-        self.tableWidget.setSortingEnabled(False)
-
-        batch_data = self.db.get_all_batches()
-        if batch_data:
-            formatted_data = []
-            for batch in batch_data:
-                formatted_data.append(
-                    {
-                        "batch_name": batch[1],
-                        "subfolder_count": batch[2],
-                        "image_count": batch[3],
-                        "sampling_attempts": str(batch[4]),
-                        "status": batch[5],
-                    }
-                )
-            self.startSampleButton.setEnabled(True)
-            self.update_table(formatted_data)
-        # Restore the sort order and column
-        self.tableWidget.sortItems(current_sort_column, current_sort_order)
-        # Re-enable sorting
-        self.tableWidget.setSortingEnabled(True)
+
+    def closeEvent(self, event):
+        # Let reports under way finish before the application exits
+        self.report_generator.shutdown(wait=True)
+        event.accept()
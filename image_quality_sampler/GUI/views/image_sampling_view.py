@@ -1,10 +1,15 @@
+import functools
+import math
 import os
+import secrets
+import threading
 
 from PyQt5 import QtGui
-from PyQt5.QtCore import QRectF, Qt
+from PyQt5.QtCore import QRectF, Qt, pyqtSignal
 from PyQt5.QtGui import QIcon, QPixmap
 from PyQt5.QtWidgets import (
     QAction,
+    QApplication,
     QGraphicsScene,
     QGraphicsView,
     QHBoxLayout,
@@ -22,10 +27,20 @@ from image_quality_sampler.GUI.utils.helpers import (
     extract_image_metadata,
     select_random_images,
 )
-from image_quality_sampler.reports import visualize
+from image_quality_sampler.GUI.utils.image_loader import (
+    ImageLoader,
+    crop_tiles,
+    decode_full_image,
+    decode_preview,
+    is_single_block,
+    read_image_size,
+)
 
 
 class ImageSamplingView(QWidget):
+    # Image index and the tiles decoded for it, by grid position
+    tiles_decoded = pyqtSignal(int, dict)
+
     def __init__(
         self,
         folder_path,
@@ -51,7 +66,39 @@ class ImageSamplingView(QWidget):
         self.rejections = 0
         self.rejected_images = []
         self.current_image_index = 0
-        self.images = select_random_images(self.folder_path, self.sample_size)
+        # The seed is stored so the same sample can be drawn for audits
+        self.seed = secrets.randbits(63)
+        self.images = select_random_images(
+            self.folder_path, self.sample_size, seed=self.seed
+        )
+        self.db.insert_sample(
+            self.batch_name,
+            self.current_status[4] + 1,
+            self.seed,
+            self.sample_size,
+        )
+        # Decodes screen sized previews of the next images while the
+        # current one is inspected
+        screen = QApplication.primaryScreen()
+        preview_size = screen.size() * screen.devicePixelRatio()
+        self.image_loader = ImageLoader(
+            [os.path.join(self.folder_path, img) for img in self.images],
+            decode=functools.partial(
+                decode_preview,
+                max_size=(preview_size.width(), preview_size.height()),
+            ),
+        )
+        # Full resolution tiles shown over the preview, by grid position,
+        # and the positions being decoded on the loader's threads
+        self.tiles = {}
+        self.pending_tiles = set()
+        self.full_size = None
+        self.single_block = False
+        # (index, image) of the current image decoded in full, kept for
+        # single block images so scrolling doesn't decode them again
+        self.full_image = None
+        self.full_image_lock = threading.Lock()
+        self.tiles_decoded.connect(self.add_tiles)
         self.initUI()
 
     def initUI(self):
@@ -109,12 +156,14 @@ class ImageSamplingView(QWidget):
 
     def zoom_in(self):
         self.graphics_view.scale(1.2, 1.2)
+        self.load_visible_tiles()
 
     def zoom_out(self):
         self.graphics_view.scale(0.8, 0.8)
 
     def zoom_1_1(self):
         self.graphics_view.resetTransform()
+        self.load_visible_tiles()
 
     def zoom_fit(self):
         self.graphics_view.fitInView(
@@ -132,6 +181,11 @@ class ImageSamplingView(QWidget):
         self.graphics_scene = QGraphicsScene()
         self.graphics_view.setScene(self.graphics_scene)
         self.graphics_view.setAlignment(Qt.AlignCenter)
+        for scroll_bar in (
+            self.graphics_view.horizontalScrollBar(),
+            self.graphics_view.verticalScrollBar(),
+        ):
+            scroll_bar.valueChanged.connect(self.load_visible_tiles)
         self.image_display_layout.addWidget(self.graphics_view)
         self.metadata_label = QLabel(self)
 
@@ -167,10 +221,18 @@ class ImageSamplingView(QWidget):
     def display_image(self):
         img_name = self.images[self.current_image_index]
         img_path = os.path.join(self.folder_path, img_name)
-        pixmap = QPixmap(img_path)
+        self.current_path = img_path
+        self.full_size = read_image_size(img_path)
+        self.single_block = is_single_block(img_path)
+        with self.full_image_lock:
+            self.full_image = None
+        preview = QPixmap.fromImage(
+            self.image_loader.get(self.current_image_index)
+        )
+        self.preview_width = preview.width()
 
         # Extract metadata
-        metadata_dict = extract_image_metadata(img_path)
+        metadata_dict = extract_image_metadata(img_path, cache=self.db)
         metadata_text = "\n".join(
             [f"{key}: {value}" for key, value in metadata_dict.items()]
         )
@@ -178,16 +240,118 @@ class ImageSamplingView(QWidget):
 
         self.update_counters()
 
-        # Update QGraphicsView content
+        # Update QGraphicsView content, the scene is in full resolution
+        # pixels with the preview scaled up to cover it
+        self.tiles = {}
+        self.pending_tiles = set()
         self.graphics_scene.clear()  # Clear previous content
-        self.graphics_scene.addPixmap(pixmap)
-        self.graphics_scene.setSceneRect(QRectF(pixmap.rect()))
+        preview_item = self.graphics_scene.addPixmap(preview)
+        preview_item.setTransformationMode(Qt.SmoothTransformation)
+        preview_item.setScale(self.full_size[0] / preview.width())
+        self.graphics_scene.setSceneRect(
+            QRectF(0, 0, self.full_size[0], self.full_size[1])
+        )
 
         # Calculate the scaling factor
-        scale_factor = self.graphics_view.height() / pixmap.height()
+        scale_factor = self.graphics_view.height() / self.full_size[1]
         self.graphics_view.setTransform(
             QtGui.QTransform().scale(scale_factor, scale_factor)
         )
+        self.load_visible_tiles()
+
+    def load_visible_tiles(self):
+        if self.full_size is None:
+            return
+        scale = self.graphics_view.transform().m11()
+        wanted = set()
+        # Tiles are only needed once the preview is magnified
+        if scale * self.full_size[0] > self.preview_width:
+            visible = (
+                self.graphics_view.mapToScene(
+                    self.graphics_view.viewport().rect()
+                ).boundingRect()
+                & self.graphics_scene.sceneRect()
+            )
+            size = config.IMAGE_TILE_SIZE
+            columns = range(
+                int(visible.left()) // size,
+                math.ceil(visible.right() / size),
+            )
+            rows = range(
+                int(visible.top()) // size,
+                math.ceil(visible.bottom() / size),
+            )
+            wanted = {(column, row) for column in columns for row in rows}
+        # Drop tiles scrolled out of view to keep memory flat
+        for key in list(self.tiles):
+            if key not in wanted:
+                self.graphics_scene.removeItem(self.tiles.pop(key))
+        self.pending_tiles &= wanted
+        missing = wanted - set(self.tiles) - self.pending_tiles
+        if not missing:
+            return
+        # Decoded on the loader's threads and added once they are done
+        self.pending_tiles |= missing
+        index = self.current_image_index
+        future = self.image_loader.submit(
+            self.decode_tiles,
+            index,
+            self.current_path,
+            {key: self.tile_box(*key) for key in missing},
+            self.single_block,
+        )
+        future.add_done_callback(
+            lambda future: self.tiles_done(index, missing, future)
+        )
+
+    def decode_tiles(self, index, path, boxes, single_block):
+        # Runs on the loader's threads
+        if index != self.current_image_index:
+            return {}
+        image = None
+        if single_block:
+            with self.full_image_lock:
+                if self.full_image is None or self.full_image[0] != index:
+                    self.full_image = (index, decode_full_image(path))
+                image = self.full_image[1]
+        return crop_tiles(path, boxes, image)
+
+    def tiles_done(self, index, keys, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"Error decoding tiles: {future.exception()}")
+            # Not pending anymore, so they are tried again on the next
+            # scroll
+            tiles = dict.fromkeys(keys)
+        else:
+            tiles = future.result()
+        # Queued to the GUI thread, pixmaps can only be made there
+        self.tiles_decoded.emit(index, tiles)
+
+    def add_tiles(self, index, tiles):
+        if index != self.current_image_index:
+            return
+        for key, tile in tiles.items():
+            if key not in self.pending_tiles:
+                continue  # Scrolled out of view in the meantime
+            self.pending_tiles.discard(key)
+            if tile is None:
+                continue
+            box = self.tile_box(*key)
+            item = self.graphics_scene.addPixmap(QPixmap.fromImage(tile))
+            item.setPos(box[0], box[1])
+            item.setZValue(1)
+            self.tiles[key] = item
+
+    def tile_box(self, column, row):
+        size = config.IMAGE_TILE_SIZE
+        return (
+            column * size,
+            row * size,
+            min((column + 1) * size, self.full_size[0]),
+            min((row + 1) * size, self.full_size[1]),
+        )
 
     def accept_image(self):
         self.current_image_index += 1
@@ -247,11 +411,13 @@ class ImageSamplingView(QWidget):
             )
 
             if reply == QMessageBox.Yes:
+                self.image_loader.shutdown()
                 self.main_window.show()
                 event.accept()
             else:
                 event.ignore()
         else:
+            self.image_loader.shutdown()
             event.accept()
 
     def update_batch(self, status):
@@ -263,6 +429,10 @@ class ImageSamplingView(QWidget):
             index,
             status,
         )
+        # The watcher only reports its own changes, show ours directly
+        self.main_window.apply_batch_changes(
+            [self.db.get_batch(self.batch_name)], []
+        )
         print(f"Updated Batch {self.batch_name}")
 
     def get_rejection_reason(self):
@@ -295,6 +465,8 @@ class ImageSamplingView(QWidget):
             "Documents": self.current_status[2],
             "Sample": self.sample_size,
             "Sampling Plan": self.rejection_size,
+            "Attempt": self.current_status[4] + 1,
+            "Seed": self.seed,
             "Checked Images": [
                 os.path.join(self.folder_path, img) for img in self.images
             ],
@@ -304,4 +476,5 @@ class ImageSamplingView(QWidget):
             "User 1": self.name1,
             "User 2": self.name2,
         }
-        visualize.create_report(sampling_results)
+        # Written in the background, the batch status is already stored
+        self.main_window.generate_report(sampling_results)
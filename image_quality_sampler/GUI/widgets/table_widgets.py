@@ -1,6 +1,127 @@
-from PyQt5.QtWidgets import QTableWidgetItem
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QBrush, QColor
 
+# Role used by the sort proxy, numeric columns sort by value
+SORT_ROLE = Qt.ItemDataRole.UserRole
 
-class NumericTableWidgetItem(QTableWidgetItem):
-    def __lt__(self, other):
-        return int(self.text()) < int(other.text())
+STATUS_COLORS = {
+    "REJECTED": "red",
+    "TEMP REJECTED": "yellow",
+    "PENDING": "cyan",
+    "PASSED": "green",
+}
+
+
+def status_brushes(color_name):
+    color = QColor(color_name)
+    # Determine text color based on background color brightness
+    brightness = (
+        (color.red() * 0.299)
+        + (color.green() * 0.587)
+        + (color.blue() * 0.114)
+    )
+    text_color = QColor("black") if brightness > 127.5 else QColor("white")
+    return QBrush(color), QBrush(text_color)
+
+
+# Built once and shared by every cell instead of per item and refresh
+BRUSHES = {
+    status: status_brushes(color) for status, color in STATUS_COLORS.items()
+}
+DEFAULT_BRUSHES = status_brushes("white")
+
+
+class BatchTableModel(QAbstractTableModel):
+    HEADERS = [
+        "Batch Name",
+        "Subfolder Count",
+        "Image Count",
+        "Sampling Attempts",
+        "Status",
+    ]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # (batch_name, folder_count, image_count, attempts, status) rows
+        self.rows = []
+        # Row number of each batch name
+        self.row_numbers = {}
+
+    @staticmethod
+    def make_row(batch):
+        # Database rows start with the id, which is not shown
+        return (batch[1], batch[2], batch[3], int(batch[4] or 0), batch[5])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return str(row[index.column()])
+        if role == SORT_ROLE:
+            return row[index.column()]
+        if role == Qt.BackgroundRole:
+            return BRUSHES.get(row[4], DEFAULT_BRUSHES)[0]
+        if role == Qt.ForegroundRole:
+            return BRUSHES.get(row[4], DEFAULT_BRUSHES)[1]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+
+    def batch_names(self):
+        return [row[0] for row in self.rows]
+
+    def reset_batches(self, batches):
+        if not self.rows:
+            # Nothing to keep on the first load
+            self.beginResetModel()
+            self.rows = [self.make_row(batch) for batch in batches]
+            self.row_numbers = {row[0]: i for i, row in enumerate(self.rows)}
+            self.endResetModel()
+            return
+        # Later full lists are applied as changes, so the selection,
+        # scroll position and sort survive a rescan
+        batches = list(batches)
+        names = {batch[1] for batch in batches}
+        removed = [name for name in self.row_numbers if name not in names]
+        self.apply_batch_changes(batches, removed)
+
+    def apply_batch_changes(self, batches, removed_batches):
+        for batch_name in removed_batches:
+            number = self.row_numbers.get(batch_name)
+            if number is None:
+                continue
+            self.beginRemoveRows(QModelIndex(), number, number)
+            del self.rows[number]
+            self.row_numbers = {row[0]: i for i, row in enumerate(self.rows)}
+            self.endRemoveRows()
+        for batch in batches:
+            row = self.make_row(batch)
+            number = self.row_numbers.get(row[0])
+            if number is None:
+                number = len(self.rows)
+                self.beginInsertRows(QModelIndex(), number, number)
+                self.rows.append(row)
+                self.row_numbers[row[0]] = number
+                self.endInsertRows()
+            elif self.rows[number] != row:
+                # Only repaint (and re-sort) rows whose values changed
+                self.rows[number] = row
+                self.dataChanged.emit(
+                    self.index(number, 0),
+                    self.index(number, len(self.HEADERS) - 1),
+                )
@@ -1,12 +1,185 @@
-"""Entry point for image_quality_sampler."""
+"""Entry point for image_quality_sampler.
+
+Without a command the GUI is started. The commands run headless, print
+their result as JSON on stdout and never import PyQt5:
+
+    python -m image_quality_sampler scan ROOT/BATCH1 ROOT/BATCH2
+    python -m image_quality_sampler plan 1200 --level II --aql 2.5
+    python -m image_quality_sampler sample ROOT/BATCH1 80 --seed 42
+    python -m image_quality_sampler report session.json [--store]
+"""
+import argparse
+import json
 import logging
+import os
+import secrets
+import sys
 from multiprocessing import freeze_support
 
-from image_quality_sampler.qt import main  # pragma: no cover
+from image_quality_sampler import sampling_plan
+
+
+def scan(args):
+    # The watcher's analysis of each batch folder, without the watcher
+    from image_quality_sampler import scanner
+
+    paths = [os.path.normpath(os.path.abspath(path)) for path in args.paths]
+    for path in paths:
+        # Checked up front, a missing folder would scan as an empty batch
+        if not os.path.isdir(path):
+            raise NotADirectoryError(f"Not a batch folder: {path}")
+    results = [scanner.analyze_batch(path) for path in paths]
+    if args.store:
+        from image_quality_sampler.db.database_manager import DatabaseManager
+
+        db = DatabaseManager()
+        db.sync_batches(results)
+        db.close()
+    return [
+        {
+            "batch_name": data["batch_name"],
+            "path": os.path.abspath(path),
+            "subfolder_count": data["subfolder_count"],
+            "image_count": data["image_count"],
+        }
+        for path, data in zip(args.paths, results)
+    ]
+
+
+def plan(args):
+    sample_size, accept, reject = sampling_plan.get_sample_size_and_acceptance(
+        args.lot_size, args.level, args.aql
+    )
+    return {
+        "lot_size": args.lot_size,
+        "inspection_level": args.level,
+        "aql": args.aql,
+        "sample_size": sample_size,
+        "acceptance_number": accept,
+        "rejection_number": reject,
+    }
+
+
+def sample(args):
+    from image_quality_sampler.scanner import select_random_images
+
+    # Like the GUI, always seeded so the sample can be drawn again
+    seed = secrets.randbits(63) if args.seed is None else args.seed
+    images = select_random_images(args.folder, args.sample_size, seed=seed)
+    return {
+        "folder": os.path.abspath(args.folder),
+        "sample_size": args.sample_size,
+        "seed": seed,
+        "images": images,
+    }
+
+
+def report(args):
+    from image_quality_sampler.reports import visualize
+
+    with open(args.session, encoding="utf-8") as f:
+        data = json.load(f)
+    # Named in the reports directory unless an output is given
+    output = visualize.create_report(data, args.output, args.reports_dir)
+    if args.store:
+        from image_quality_sampler.db.database_manager import DatabaseManager
+
+        db = DatabaseManager()
+        db.insert_report(data["Batch Name"], data.get("Attempt", 0), output)
+        db.close()
+    return {
+        "batch_name": data.get("Batch Name"),
+        "attempt": data.get("Attempt", 0),
+        "report": output,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="image_quality_sampler",
+        description="Image quality sampling. Starts the GUI when no "
+        "command is given.",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    scan_parser = commands.add_parser(
+        "scan", help="count the subfolders and images of batch folders"
+    )
+    scan_parser.add_argument("paths", nargs="+", metavar="batch_folder")
+    scan_parser.add_argument(
+        "--store",
+        action="store_true",
+        help="also record the counts in the database",
+    )
+    scan_parser.set_defaults(run=scan)
+
+    plan_parser = commands.add_parser(
+        "plan", help="look up the sampling plan for a lot size"
+    )
+    plan_parser.add_argument("lot_size", type=int)
+    plan_parser.add_argument(
+        "--level", choices=sampling_plan.INSPECTION_LEVELS, default="II"
+    )
+    plan_parser.add_argument(
+        "--aql", choices=sampling_plan.AQLS, required=True
+    )
+    plan_parser.set_defaults(run=plan)
+
+    sample_parser = commands.add_parser(
+        "sample", help="draw a random sample of the images in a folder"
+    )
+    sample_parser.add_argument("folder")
+    sample_parser.add_argument("sample_size", type=int)
+    sample_parser.add_argument(
+        "--seed", type=int, help="repeat an earlier sample"
+    )
+    sample_parser.set_defaults(run=sample)
+
+    report_parser = commands.add_parser(
+        "report", help="create the PDF report of a saved session"
+    )
+    report_parser.add_argument(
+        "session", help="JSON file with the session data of the report"
+    )
+    report_parser.add_argument("-o", "--output", help="path of the PDF")
+    report_parser.add_argument(
+        "--reports-dir", help="folder of the named reports"
+    )
+    report_parser.add_argument(
+        "--store",
+        action="store_true",
+        help="also record the report in the database",
+    )
+    report_parser.set_defaults(run=report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        # Imported here so processes spawned from this module, which
+        # import it again, and the commands don't load the GUI
+        from image_quality_sampler.qt import main as run_gui
+
+        run_gui()
+        return 0
+    try:
+        result = args.run(args)
+    except (OSError, ValueError) as e:
+        print(f"{args.command}: {e}", file=sys.stderr)
+        return 1
+    except KeyError as e:
+        # A session file without a field the report needs
+        print(f"{args.command}: missing {e}", file=sys.stderr)
+        return 1
+    json.dump(result, sys.stdout)
+    print()
+    return 0
+
 
 if __name__ == "__main__":  # pragma: no cover
     freeze_support()
     try:
-        main()
+        sys.exit(main())
     except Exception as e:
         logging.error(f"Error: {e}", exc_info=True)
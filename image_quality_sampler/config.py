@@ -15,3 +15,51 @@ FONT_PATH = os.path.join(RESOURCE_PATH, "fonts")
 
 # Database configuration
 DB_FILENAME = os.path.join(BASE_DIR, "app_data.db")
+
+# Generated PDF reports, named by batch, attempt and time
+REPORTS_DIR = os.path.join(BASE_DIR, "generated_reports")
+
+# Watcher event coalescing, in seconds
+WATCHER_QUIET_WINDOW = 2.0
+WATCHER_MAX_LATENCY = 10.0
+
+# File extensions counted as images by the scanner (case insensitive)
+IMAGE_EXTENSIONS = (
+    ".tif",
+    ".tiff",
+    ".jpg",
+    ".jpeg",
+    ".jpe",
+    ".jp2",
+    ".j2k",
+    ".png",
+    ".bmp",
+    ".gif",
+    ".webp",
+)
+
+# Parallel batch scanning: "thread" suits network shares, "process"
+# helps when classifying files is CPU bound
+WATCHER_SCAN_EXECUTOR = "thread"
+WATCHER_SCAN_WORKERS = 8
+WATCHER_SCAN_MAX_IN_FLIGHT = 16
+
+# SQLite connection tuning, applied to every DatabaseManager connection
+DB_BUSY_TIMEOUT = 5000  # milliseconds to wait for a lock
+DB_SYNCHRONOUS = "NORMAL"  # safe with WAL, fsyncs only at checkpoints
+DB_CACHE_SIZE = -16000  # negative values are KiB
+DB_MMAP_SIZE = 64 * 1024 * 1024
+
+# Image sampling: decoded images kept ahead of the one on screen
+IMAGE_PREFETCH_COUNT = 3
+IMAGE_LOADER_WORKERS = 2
+IMAGE_CACHE_BYTES = 768 * 1024 * 1024
+
+# Full resolution tiles loaded for the visible part of zoomed images
+IMAGE_TILE_SIZE = 512
+
+# Image metadata cached in the database, least recently used go first
+METADATA_CACHE_MAX_ROWS = 100000
+
+# PDF reports are generated in worker processes, off the GUI thread
+REPORT_WORKERS = 1
@@ -1,19 +1,184 @@
+import json
+import pathlib
 import sqlite3
+import time
 
 from image_quality_sampler import config
 
 
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Only ever append new steps, released ones may already be applied.
+MIGRATIONS = [
+    # 1: initial schema (IF NOT EXISTS adopts databases created before
+    # migrations were introduced)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS configuration (
+            id INTEGER PRIMARY KEY,
+            project_name TEXT NOT NULL,
+            location TEXT NOT NULL,
+            batch_folder TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS batches (
+            id INTEGER PRIMARY KEY,
+            batch_name TEXT NOT NULL,
+            folder_count INTEGER NOT NULL,
+            image_count INTEGER NOT NULL,
+            sampling_attempts INTEGER,
+            status TEXT NOT NULL
+        )
+        """,
+    ],
+    # 2: unique batch names, keeping the oldest row of any duplicates
+    [
+        """
+        DELETE FROM batches WHERE id NOT IN (
+            SELECT MIN(id) FROM batches GROUP BY batch_name
+        )
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS batches_batch_name
+        ON batches (batch_name)
+        """,
+    ],
+    # 3: file inventory, paths relative to the batch folder root and
+    # mtimes in nanoseconds
+    [
+        """
+        CREATE TABLE IF NOT EXISTS directories (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            batch_name TEXT NOT NULL,
+            parent TEXT,
+            mtime INTEGER NOT NULL,
+            image_count INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS directories_batch_name
+        ON directories (batch_name)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS images (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            batch_name TEXT NOT NULL,
+            directory TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime INTEGER NOT NULL,
+            file_type TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS images_batch_name ON images (batch_name)",
+        "CREATE INDEX IF NOT EXISTS images_directory ON images (directory)",
+    ],
+    # 4: image metadata cache, valid while size and mtime (ns) match
+    [
+        """
+        CREATE TABLE IF NOT EXISTS metadata_cache (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime INTEGER NOT NULL,
+            metadata TEXT NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS metadata_cache_last_used
+        ON metadata_cache (last_used)
+        """,
+    ],
+    # 5: seeds of the samples drawn, to draw them again for audits
+    [
+        """
+        CREATE TABLE IF NOT EXISTS samples (
+            id INTEGER PRIMARY KEY,
+            batch_name TEXT NOT NULL,
+            attempt INTEGER NOT NULL,
+            seed INTEGER NOT NULL,
+            sample_size INTEGER NOT NULL,
+            created TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS samples_batch_name
+        ON samples (batch_name)
+        """,
+    ],
+    # 6: reports written for each sampling attempt
+    [
+        """
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY,
+            batch_name TEXT NOT NULL,
+            attempt INTEGER NOT NULL,
+            path TEXT NOT NULL UNIQUE,
+            created TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS reports_batch_name
+        ON reports (batch_name)
+        """,
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
 class DatabaseManager:
-    def __init__(self):
-        self.conn = sqlite3.connect(config.DB_FILENAME)
+    def __init__(self, read_only=False):
+        self.read_only = read_only
+        timeout = config.DB_BUSY_TIMEOUT / 1000
+        if read_only:
+            # Readers never take write locks, so GUI refreshes are not
+            # held up by watcher writes (and vice versa) in WAL mode
+            uri = pathlib.Path(config.DB_FILENAME).absolute().as_uri()
+            self.conn = sqlite3.connect(
+                f"{uri}?mode=ro", uri=True, timeout=timeout
+            )
+        else:
+            self.conn = sqlite3.connect(config.DB_FILENAME, timeout=timeout)
         self.cursor = self.conn.cursor()
+        self.configure_connection()
+        self.configuration = None
+        self.configuration_version = None
+
+        # Create or upgrade the schema in place
+        if not read_only and self.get_schema_version() < SCHEMA_VERSION:
+            self.migrate()
+
+    def configure_connection(self):
+        if not self.read_only:
+            # Persistent, lets readers and one writer work concurrently
+            self.cursor.execute("PRAGMA journal_mode = WAL")
+        self.cursor.execute(f"PRAGMA busy_timeout = {config.DB_BUSY_TIMEOUT}")
+        self.cursor.execute(f"PRAGMA synchronous = {config.DB_SYNCHRONOUS}")
+        self.cursor.execute(f"PRAGMA cache_size = {config.DB_CACHE_SIZE}")
+        self.cursor.execute(f"PRAGMA mmap_size = {config.DB_MMAP_SIZE}")
 
-        # Check if tables exist, if not, create them
-        if not self.check_table_exists("configuration"):
-            self.create_configuration_table()
+    def get_schema_version(self):
+        self.cursor.execute("PRAGMA user_version")
+        return self.cursor.fetchone()[0]
 
-        if not self.check_table_exists("batches"):
-            self.create_batches_table()
+    def migrate(self):
+        # IMMEDIATE takes the write lock up front, so when the GUI and
+        # the watcher start together only one of them runs the steps
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            version = self.get_schema_version()
+            for number, statements in enumerate(MIGRATIONS, 1):
+                if number <= version:
+                    continue
+                for statement in statements:
+                    self.cursor.execute(statement)
+                self.cursor.execute(f"PRAGMA user_version = {number}")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
 
     def check_table_exists(self, table_name):
         self.cursor.execute(
@@ -24,34 +189,6 @@ class DatabaseManager:
         )
         return self.cursor.fetchone()[0] == 1
 
-    def create_configuration_table(self):
-        self.cursor.execute(
-            """
-            CREATE TABLE configuration (
-                id INTEGER PRIMARY KEY,
-                project_name TEXT NOT NULL,
-                location TEXT NOT NULL,
-                batch_folder TEXT NOT NULL
-            )
-            """
-        )
-        self.conn.commit()
-
-    def create_batches_table(self):
-        self.cursor.execute(
-            """
-            CREATE TABLE batches (
-                id INTEGER PRIMARY KEY,
-                batch_name TEXT NOT NULL,
-                folder_count INTEGER NOT NULL,
-                image_count INTEGER NOT NULL,
-                sampling_attempts INTEGER,
-                status TEXT NOT NULL
-            )
-            """
-        )
-        self.conn.commit()
-
     def insert_configuration(self, project_name, location, batch_folder):
         self.cursor.execute(
             """
@@ -61,6 +198,7 @@ class DatabaseManager:
             (project_name, location, batch_folder),
         )
         self.conn.commit()
+        self.configuration_version = None
 
     def update_configuration(self, project_name, location, batch_folder):
         self.cursor.execute(
@@ -72,6 +210,20 @@ class DatabaseManager:
             (project_name, location, batch_folder),
         )
         self.conn.commit()
+        self.configuration_version = None
+
+    def get_data_version(self):
+        # Changes whenever another connection commits to the database
+        self.cursor.execute("PRAGMA data_version")
+        return self.cursor.fetchone()[0]
+
+    def get_cached_configuration(self):
+        # Only hit the table again after someone else committed
+        data_version = self.get_data_version()
+        if data_version != self.configuration_version:
+            self.configuration = self.get_configuration()
+            self.configuration_version = data_version
+        return self.configuration
 
     def get_configuration(self):
         self.cursor.execute(
@@ -121,6 +273,50 @@ class DatabaseManager:
         )
         self.conn.commit()
 
+    def adjust_batch_counts(
+        self,
+        batch_name,
+        folder_delta,
+        image_delta,
+        added_images=(),
+        removed_images=(),
+    ):
+        # The images table follows the same events as the counts and is
+        # updated in the same transaction, so it always lists the images
+        # counted. Directory rows are only kept by the scans, the folders
+        # changed since are listed again by the next one.
+        # added_images holds (path, directory, size, mtime, file_type)
+        # rows, removed_images paths.
+        try:
+            self.cursor.execute(
+                """
+                UPDATE batches
+                SET folder_count = MAX(folder_count + ?, 0),
+                image_count = MAX(image_count + ?, 0)
+                WHERE batch_name = ?
+                """,
+                (folder_delta, image_delta, batch_name),
+            )
+            self.cursor.executemany(
+                "DELETE FROM images WHERE path = ?",
+                [(path,) for path in removed_images],
+            )
+            self.cursor.executemany(
+                """
+                INSERT OR REPLACE INTO images (path, batch_name, directory,
+                size, mtime, file_type)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (path, batch_name, directory, size, mtime, file_type)
+                    for path, directory, size, mtime, file_type in added_images
+                ],
+            )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
     def get_batch(self, batch_name):
         self.cursor.execute(
             "SELECT * FROM batches WHERE batch_name = ?",
@@ -136,6 +332,206 @@ class DatabaseManager:
         self.cursor.execute(
             "DELETE FROM batches WHERE batch_name = ?", (batch_name,)
         )
+        self.cursor.execute(
+            "DELETE FROM directories WHERE batch_name = ?", (batch_name,)
+        )
+        self.cursor.execute(
+            "DELETE FROM images WHERE batch_name = ?", (batch_name,)
+        )
+        self.conn.commit()
+
+    def get_directories(self, batch_name):
+        self.cursor.execute(
+            """
+            SELECT path, parent, mtime, image_count FROM directories
+            WHERE batch_name = ?
+            """,
+            (batch_name,),
+        )
+        return {
+            path: (parent, mtime, image_count)
+            for path, parent, mtime, image_count in self.cursor.fetchall()
+        }
+
+    def store_inventory(self, batch_name, directories, images, commit=True):
+        # directories holds every folder seen by the scan, images only
+        # the listings of folders that had to be read again
+        self.cursor.execute(
+            "SELECT path FROM directories WHERE batch_name = ?",
+            (batch_name,),
+        )
+        removed = [
+            row for row in self.cursor.fetchall() if row[0] not in directories
+        ]
+        self.cursor.executemany(
+            "DELETE FROM directories WHERE path = ?", removed
+        )
+        self.cursor.executemany(
+            "DELETE FROM images WHERE directory = ?",
+            removed + [(path,) for path in images],
+        )
+        self.cursor.executemany(
+            """
+            INSERT OR REPLACE INTO directories (path, batch_name, parent,
+            mtime, image_count)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (path, batch_name, *directories[path])
+                for path in images
+                if path in directories
+            ],
+        )
+        self.cursor.executemany(
+            """
+            INSERT OR REPLACE INTO images (path, batch_name, directory, size,
+            mtime, file_type)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (path, batch_name, directory, size, mtime, file_type)
+                for directory, rows in images.items()
+                for path, size, mtime, file_type in rows
+            ],
+        )
+        if commit:
+            self.conn.commit()
+
+    def sync_batches(self, scan_results, existing_batches=None):
+        # Reconcile scan results, keeping the sampling attempts and status
+        # of known batches. When the names of the batch folders still
+        # present are given, every other batch is removed as well.
+        # scan_results may be a generator: the inventory of each batch is
+        # written and committed as it arrives, so the write lock is not
+        # held while scanning and only the counts are kept until the
+        # batch rows are updated in a single transaction at the end.
+        counts = []
+        try:
+            for data in scan_results:
+                counts.append(
+                    (
+                        data["batch_name"],
+                        data["subfolder_count"],
+                        data["image_count"],
+                    )
+                )
+                self.store_inventory(
+                    data["batch_name"], data["directories"], data["images"]
+                )
+            self.cursor.executemany(
+                """
+                INSERT INTO batches (batch_name, folder_count,
+                image_count, sampling_attempts, status)
+                VALUES (?, ?, ?, 0, 'PENDING')
+                ON CONFLICT (batch_name) DO UPDATE SET
+                folder_count = excluded.folder_count,
+                image_count = excluded.image_count
+                """,
+                counts,
+            )
+            if existing_batches is not None:
+                names = json.dumps(list(existing_batches))
+                for table in ("batches", "directories", "images"):
+                    self.cursor.execute(
+                        f"""
+                        DELETE FROM {table} WHERE batch_name NOT IN (
+                            SELECT value FROM json_each(?)
+                        )
+                        """,
+                        (names,),
+                    )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def insert_sample(self, batch_name, attempt, seed, sample_size):
+        self.cursor.execute(
+            """
+            INSERT INTO samples (batch_name, attempt, seed, sample_size)
+            VALUES (?, ?, ?, ?)
+            """,
+            (batch_name, attempt, seed, sample_size),
+        )
+        self.conn.commit()
+
+    def get_samples(self, batch_name):
+        self.cursor.execute(
+            """
+            SELECT attempt, seed, sample_size, created FROM samples
+            WHERE batch_name = ? ORDER BY id
+            """,
+            (batch_name,),
+        )
+        return self.cursor.fetchall()
+
+    def insert_report(self, batch_name, attempt, path):
+        self.cursor.execute(
+            """
+            INSERT INTO reports (batch_name, attempt, path)
+            VALUES (?, ?, ?)
+            """,
+            (batch_name, attempt, path),
+        )
+        self.conn.commit()
+
+    def get_reports(self, batch_name):
+        self.cursor.execute(
+            """
+            SELECT attempt, path, created FROM reports
+            WHERE batch_name = ? ORDER BY id
+            """,
+            (batch_name,),
+        )
+        return self.cursor.fetchall()
+
+    def get_cached_metadata(self, path, size, mtime):
+        self.cursor.execute(
+            """
+            SELECT metadata FROM metadata_cache
+            WHERE path = ? AND size = ? AND mtime = ?
+            """,
+            (path, size, mtime),
+        )
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        if not self.read_only:
+            self.cursor.execute(
+                "UPDATE metadata_cache SET last_used = ? WHERE path = ?",
+                (time.time(), path),
+            )
+            self.conn.commit()
+        metadata = json.loads(row[0])
+        if "DPI" in metadata:
+            metadata["DPI"] = tuple(metadata["DPI"])
+        return metadata
+
+    def store_cached_metadata(self, path, size, mtime, metadata):
+        self.cursor.execute(
+            """
+            INSERT OR REPLACE INTO metadata_cache (path, size, mtime,
+            metadata, last_used)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                path,
+                size,
+                mtime,
+                json.dumps(metadata, default=float),
+                time.time(),
+            ),
+        )
+        # Evict the least recently used entries past the limit
+        self.cursor.execute(
+            """
+            DELETE FROM metadata_cache WHERE path IN (
+                SELECT path FROM metadata_cache
+                ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (config.METADATA_CACHE_MAX_ROWS,),
+        )
         self.conn.commit()
 
     def close(self):
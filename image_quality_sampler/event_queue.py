@@ -0,0 +1,160 @@
+import threading
+import time
+
+from image_quality_sampler import config
+
+
+class BatchEventQueue:
+    """Coalesces watcher events into one update per dirty batch.
+
+    Changes are collected until no event arrived for ``quiet_window``
+    seconds, or ``max_latency`` seconds passed since the first pending
+    one, and are then handed to ``process(changes, root_change)``.
+    ``on_stop`` is called from the worker thread once it stops, to
+    release what ``process`` holds per thread.
+    """
+
+    def __init__(
+        self,
+        process,
+        quiet_window=config.WATCHER_QUIET_WINDOW,
+        max_latency=config.WATCHER_MAX_LATENCY,
+        on_stop=None,
+    ):
+        self.process = process
+        self.on_stop = on_stop
+        self.quiet_window = quiet_window
+        self.max_latency = max_latency
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.root_change = None
+        self.first_event_time = None
+        self.last_event_time = None
+        self.running = False
+        self.thread = None
+
+        # Counters to compare the raw event rate against the work done
+        self.events_received = 0
+        self.rescans_performed = 0
+        self.flushes = 0
+
+    def new_change(self):
+        return {
+            "folder_delta": 0,
+            "image_delta": 0,
+            "rescan": False,
+            "created": False,
+            "removed": False,
+            # Image path -> True if it was added, False if removed, as of
+            # the last event for it
+            "images": {},
+        }
+
+    def put(
+        self,
+        batch_name,
+        folder_delta=0,
+        image_delta=0,
+        rescan=False,
+        created=False,
+        removed=False,
+        image_path=None,
+    ):
+        with self.condition:
+            change = self.pending.get(batch_name)
+            if change is None:
+                change = self.pending[batch_name] = self.new_change()
+            if removed:
+                # Anything recorded so far is moot once the folder is gone
+                change.update(self.new_change(), removed=True)
+            elif created:
+                if change["removed"]:
+                    # Replaced within the window, trust nothing but a scan
+                    change.update(self.new_change(), rescan=True)
+                else:
+                    change["created"] = True
+            elif rescan:
+                change["rescan"] = True
+            change["folder_delta"] += folder_delta
+            change["image_delta"] += image_delta
+            if image_path is not None:
+                change["images"][image_path] = image_delta > 0
+            self.mark_event()
+
+    def put_root(self, full_scan=False):
+        with self.condition:
+            if full_scan:
+                self.pending.clear()
+                self.root_change = "full"
+            elif self.root_change is None:
+                self.root_change = "sync"
+            self.mark_event()
+
+    def mark_event(self):
+        now = time.monotonic()
+        self.events_received += 1
+        if self.first_event_time is None:
+            self.first_event_time = now
+        self.last_event_time = now
+        self.condition.notify()
+
+    def take_pending(self):
+        changes, root_change = self.pending, self.root_change
+        self.pending = {}
+        self.root_change = None
+        self.first_event_time = None
+        self.last_event_time = None
+        return changes, root_change
+
+    def flush(self):
+        with self.condition:
+            changes, root_change = self.take_pending()
+        if changes or root_change:
+            self.process(changes, root_change)
+            self.rescans_performed += len(changes)
+            self.flushes += 1
+
+    def stats(self):
+        return {
+            "events_received": self.events_received,
+            "rescans_performed": self.rescans_performed,
+            "flushes": self.flushes,
+        }
+
+    def seconds_until_due(self):
+        now = time.monotonic()
+        quiet_deadline = self.last_event_time + self.quiet_window
+        latency_deadline = self.first_event_time + self.max_latency
+        return min(quiet_deadline, latency_deadline) - now
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while self.running and self.first_event_time is None:
+                        self.condition.wait()
+                    while self.running and self.first_event_time is not None:
+                        remaining = self.seconds_until_due()
+                        if remaining <= 0:
+                            break
+                        self.condition.wait(remaining)
+                    running = self.running
+                self.flush()
+                if not running:
+                    return
+        finally:
+            if self.on_stop is not None:
+                self.on_stop()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
@@ -1,31 +1,50 @@
 import atexit
-from multiprocessing import Process
+from multiprocessing import Pipe, Process
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication
 
 from image_quality_sampler import config
 from image_quality_sampler.db.database_manager import DatabaseManager
+from image_quality_sampler.GUI.utils.notifications import WatcherListener
 from image_quality_sampler.GUI.views.central_view import CentralView
-from image_quality_sampler.watcher import Watcher
 
 
 def start_watcher():  # pragma: no cover
-    watcher = Watcher()
-    watcher_process = Process(target=watcher.run)
+    # The watcher pushes batch changes back through a one-way pipe. Its
+    # entry module imports no Qt, which a spawned child would otherwise
+    # load again
+    from image_quality_sampler import watcher_main
+
+    receiver, sender = Pipe(duplex=False)
+    watcher_process = Process(target=watcher_main.run, args=(sender,))
     watcher_process.start()
-    return watcher_process
+    sender.close()
+    return watcher_process, receiver
+
+
+def report_watcher_ready(info):  # pragma: no cover
+    peak_memory = info["peak_memory"]
+    memory = f"{peak_memory / (1024 * 1024):.1f} MB" if peak_memory else "?"
+    print(
+        f"Watcher {info['pid']} ready in {info['startup'] * 1000:.0f} ms, "
+        f"peak memory {memory}"
+    )
 
 
 def main():  # pragma: no cover
-    watcher_process = start_watcher()
+    watcher_process, watcher_connection = start_watcher()
     # Register the cleanup function
     atexit.register(watcher_process.terminate)
 
     db = DatabaseManager()
+    reader = DatabaseManager(read_only=True)
 
     app = QApplication([])
-    window = CentralView(db)
+    listener = WatcherListener(watcher_connection)
+    listener.watcher_ready.connect(report_watcher_ready)
+    window = CentralView(db, reader, listener)
+    listener.start()
 
     stylesheet = open(config.CSS_PATH, "r").read()
     app.setStyleSheet(stylesheet)
@@ -0,0 +1,145 @@
+"""Operating characteristics of single sampling plans.
+
+Everything is evaluated on arrays: plans along the first axis and
+defect rates along the second, so whole families of plans (every lot
+size and AQL) are computed in one call.
+"""
+import numpy as np
+
+from image_quality_sampler import sampling_plan
+
+
+def log_factorials(n):
+    # log(k!) for k = 0..n
+    table = np.zeros(n + 1)
+    np.cumsum(np.log(np.arange(1, n + 1)), out=table[1:])
+    return table
+
+
+def xlogy(x, y):
+    # x * log(y), taken as 0 where x is 0 (so 0 * log(0) = 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(x == 0, 0.0, x * np.log(y))
+
+
+def binomial_acceptance(sample_sizes, acceptance_numbers, defect_rates):
+    """P(at most c defects in n draws) for every plan and defect rate."""
+    # Many lot sizes share a plan, each distinct (n, c) is computed once
+    pairs, inverse = np.unique(
+        np.stack(
+            [
+                np.asarray(sample_sizes, dtype=np.int64),
+                np.asarray(acceptance_numbers, dtype=np.int64),
+            ],
+            axis=1,
+        ),
+        axis=0,
+        return_inverse=True,
+    )
+    n = pairs[:, 0, None, None]
+    c = pairs[:, 1, None, None]
+    p = np.asarray(defect_rates, dtype=float)[None, :, None]
+    d = np.arange(c.max() + 1)[None, None, :]
+    table = log_factorials(int(n.max()))
+    valid = (d <= c) & (d <= n)
+    d_valid = np.minimum(d, n)
+    log_pmf = (
+        table[n]
+        - table[d_valid]
+        - table[n - d_valid]
+        + xlogy(d_valid, p)
+        + xlogy(n - d_valid, 1 - p)
+    )
+    acceptance = np.where(valid, np.exp(log_pmf), 0.0).sum(axis=2)
+    return acceptance[inverse.reshape(-1)]
+
+
+def hypergeometric_acceptance(
+    lot_sizes, sample_sizes, acceptance_numbers, defect_rates
+):
+    """Like binomial_acceptance, drawing without replacement from lots
+    holding round(rate * lot size) defective images."""
+    lots = np.asarray(lot_sizes, dtype=np.int64)[:, None, None]
+    n = np.asarray(sample_sizes, dtype=np.int64)[:, None, None]
+    c = np.asarray(acceptance_numbers, dtype=np.int64)[:, None, None]
+    p = np.asarray(defect_rates, dtype=float)[None, :, None]
+    defects = np.rint(p * lots).astype(np.int64)
+    d = np.arange(c.max() + 1)[None, None, :]
+    table = log_factorials(int(lots.max()))
+    valid = (d <= c) & (d <= defects) & (n - d <= lots - defects) & (d <= n)
+    # Clip so invalid cells still index the table, they are masked below
+    d_valid = np.clip(d, 0, np.minimum(defects, n))
+    good = lots - defects
+    rest = np.clip(n - d_valid, 0, good)
+    log_pmf = (
+        table[defects]
+        - table[d_valid]
+        - table[defects - d_valid]
+        + table[good]
+        - table[rest]
+        - table[good - rest]
+        - (table[lots] - table[n] - table[lots - n])
+    )
+    return np.where(valid, np.exp(log_pmf), 0.0).sum(axis=2)
+
+
+def operating_characteristics(
+    lot_sizes,
+    sample_sizes,
+    acceptance_numbers,
+    defect_rates,
+    distribution="binomial",
+):
+    """Acceptance probability, AOQ and ATI, shaped (plans, rates).
+
+    AOQ and ATI assume rectifying inspection: rejected lots are screened
+    in full and defective images replaced.
+    """
+    lots = np.asarray(lot_sizes, dtype=float)[:, None]
+    n = np.asarray(sample_sizes, dtype=float)[:, None]
+    p = np.asarray(defect_rates, dtype=float)[None, :]
+    if distribution == "binomial":
+        acceptance = binomial_acceptance(
+            sample_sizes, acceptance_numbers, defect_rates
+        )
+    elif distribution == "hypergeometric":
+        acceptance = hypergeometric_acceptance(
+            lot_sizes, sample_sizes, acceptance_numbers, defect_rates
+        )
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    return {
+        "defect_rates": np.asarray(defect_rates, dtype=float),
+        "acceptance": acceptance,
+        "aoq": p * acceptance * (lots - n) / lots,
+        "ati": n + (1 - acceptance) * (lots - n),
+    }
+
+
+def plan_arrays(lot_sizes, inspection_level, aql):
+    """Sample sizes and acceptance numbers the sampling plan picks.
+
+    Returns (lot sizes, sample sizes, acceptance numbers) for the lots
+    the tables cover, looked up for all lots at once.
+    """
+    lots = np.asarray(lot_sizes, dtype=np.int64)
+    index = np.searchsorted(sampling_plan.LOT_MINIMUMS, lots, "right") - 1
+    maximums = np.asarray(sampling_plan.LOT_MAXIMUMS)[index]
+    covered = (index >= 0) & ((maximums == -1) | (lots <= maximums))
+    # One plan per lot size range
+    plans = np.full((len(sampling_plan.LOT_LEVELS), 2), -1, dtype=np.int64)
+    for row, levels in enumerate(sampling_plan.LOT_LEVELS):
+        plan = sampling_plan.PLANS.get((levels[inspection_level], aql))
+        if plan is not None:
+            plans[row] = plan[:2]
+    picked = plans[np.where(covered, index, 0)]
+    covered &= picked[:, 0] >= 0
+    lots = lots[covered]
+    picked = picked[covered]
+    return lots, np.minimum(picked[:, 0], lots), picked[:, 1]
+
+
+def defect_rate_range(sample_size, acceptance, points=200):
+    # Far enough for the acceptance probability to fall close to zero
+    upper = min(1.0, 3.0 * (acceptance + 1) / sample_size)
+    return np.linspace(0.0, upper, points)
@@ -1,9 +1,12 @@
+import functools
+import itertools
 import os
+import secrets
 from datetime import datetime
 from io import BytesIO
 
-import matplotlib.pyplot as plt
-from PIL import Image as PILImage
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
@@ -20,145 +23,309 @@ from reportlab.platypus import (
 )
 
 from image_quality_sampler import config
+from image_quality_sampler.reports import oc_curve
 
 
-def generate_charts(data):
-    plt.rcParams["figure.figsize"] = (8, 6)
+# Width and height of the charts, in inches
+CHART_SIZE = (8, 6)
+
+# Rendered charts kept for reports with the same numbers, the OC curve
+# in particular is the same for every lot inspected with a plan
+CHART_CACHE_SIZE = 64
+
+
+def render_figure(draw):
+    # Figures made directly, not through pyplot, are not tracked by any
+    # global state and the Agg canvas never touches the GUI backend
+    figure = Figure(figsize=CHART_SIZE)
+    FigureCanvasAgg(figure)
+    try:
+        draw(figure.add_subplot())
+        figure.tight_layout()
+        buffer = BytesIO()
+        figure.savefig(buffer, format="png")
+    finally:
+        figure.clear()
+    return buffer.getvalue()
 
+
+@functools.lru_cache(maxsize=CHART_CACHE_SIZE)
+def pie_chart(lot, rejected):
     # Pie chart for Lot vs Sample
-    pie_buffer = BytesIO()
-    labels = ["Lot Size", "Rejected Images"]
-    sizes = [data["Lot"], len(data["Rejected Images"])]
-    plt.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90)
-    plt.axis("equal")
-    plt.title("Lot Size vs Rejected Images")
-    plt.tight_layout()
-    plt.savefig(pie_buffer, format="png")
-    pie_buffer.seek(0)
+    def draw(axes):
+        axes.pie(
+            [lot, rejected],
+            labels=["Lot Size", "Rejected Images"],
+            autopct="%1.1f%%",
+            startangle=90,
+        )
+        axes.axis("equal")
+        axes.set_title("Lot Size vs Rejected Images")
+
+    return render_figure(draw)
+
 
+@functools.lru_cache(maxsize=CHART_CACHE_SIZE)
+def bar_chart(lot, rejected):
     # Rejections vs Lot Size
-    bar_buffer = BytesIO()
-    plt.figure()
-    plt.bar(
-        ["Rejections", "Lot Size"], [len(data["Rejected Images"]), data["Lot"]]
+    def draw(axes):
+        axes.bar(["Rejections", "Lot Size"], [rejected, lot])
+        axes.set_title("Rejections vs Lot Size")
+
+    return render_figure(draw)
+
+
+@functools.lru_cache(maxsize=CHART_CACHE_SIZE)
+def oc_chart(lot, sample_size, acceptance):
+    # Operating characteristic curve of the plan used
+    defect_rates = oc_curve.defect_rate_range(sample_size, acceptance)
+    curve = oc_curve.operating_characteristics(
+        [lot], [sample_size], [acceptance], defect_rates
     )
-    plt.title("Rejections vs Lot Size")
-    plt.tight_layout()
-    plt.savefig(bar_buffer, format="png")
-    bar_buffer.seek(0)
-
-    return pie_buffer, bar_buffer
-
-
-def generate_pdf(data):
-    doc = SimpleDocTemplate(
-        "report.pdf",
-        pagesize=A4,
-        rightMargin=30,
-        leftMargin=30,
-        topMargin=30,
-        bottomMargin=18,
+
+    def draw(axes):
+        axes.plot(defect_rates * 100, curve["acceptance"][0])
+        axes.set_xlabel("Defective images (%)")
+        axes.set_ylabel("Probability of acceptance")
+        axes.set_title(
+            f"Operating Characteristic (n={sample_size}, Ac={acceptance})"
+        )
+        axes.grid(True)
+
+    return render_figure(draw)
+
+
+def generate_charts(data):
+    lot = data["Lot"]
+    rejected = len(data["Rejected Images"])
+    return (
+        BytesIO(pie_chart(lot, rejected)),
+        BytesIO(bar_chart(lot, rejected)),
+        BytesIO(oc_chart(lot, data["Sample"], data["Sampling Plan"] - 1)),
     )
+
+
+FONT_NAME = "DejaVuSans"
+
+# Placeholder text above the signatures
+CLOSING_TEXT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit."
+
+
+def register_fonts():
+    # Parsing the TTF takes tens of milliseconds, once per process is enough
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        font_path = os.path.join(config.FONT_PATH, "DejaVuSans.ttf")
+        pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+
+
+def build_styles():
     styles = getSampleStyleSheet()
-    font_path = os.path.join(config.FONT_PATH, "DejaVuSans.ttf")
-    pdfmetrics.registerFont(TTFont("DejaVuSans", font_path))
-    styles["Normal"].fontName = "DejaVuSans"
-    styles["BodyText"].fontName = "DejaVuSans"
-    styles["Heading1"].fontName = "DejaVuSans"
-    styles["Heading2"].fontName = "DejaVuSans"
-    styles["Heading3"].fontName = "DejaVuSans"
-
-    story = []
-
-    # Title, Timestamp and Root Folder
-    title = Paragraph("Image Quality Sampling Report", styles["Title"])
-    timestamp = Paragraph(
-        f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-        styles["Normal"],
-    )
-    root_folder = Paragraph(
-        f"Root Folder: {data['Batch Name']}", styles["Normal"]
-    )
-    story.extend([title, Spacer(1, inch), timestamp, root_folder])
-
-    # General Info
-    for key, value in data.items():
-        if key not in ["Checked Images", "Rejected Images"]:
-            p = Paragraph(f"{key}: {value}", styles["BodyText"])
-            story.append(p)
-    story.append(PageBreak())
-
-    # Tables
-    story.append(Paragraph("Πίνακες", styles["Heading2"]))
-    story.append(Spacer(0.5, inch))
-    story.append(Paragraph("Εικόνες που ελέχθηκαν:", styles["Heading3"]))
-    checked_table_data = [["Checked Images"]] + [
-        [
-            os.path.join(
-                os.path.basename(os.path.dirname(img)), os.path.basename(img)
-            )
+    for name in ["Normal", "BodyText", "Heading1", "Heading2", "Heading3"]:
+        styles[name].fontName = FONT_NAME
+    return styles
+
+
+def report_names(data, reports_dir=None, now=None):
+    # <batch>_attempt<N>_<date>_<time>.pdf in the reports directory, then
+    # the same with a counter for when that attempt already has a report
+    # from that second
+    reports_dir = os.path.abspath(reports_dir or config.REPORTS_DIR)
+    timestamp = (now or datetime.now()).strftime("%Y%m%d_%H%M%S")
+    stem = f"{data['Batch Name']}_attempt{data.get('Attempt', 0)}_{timestamp}"
+    yield os.path.join(reports_dir, f"{stem}.pdf")
+    for counter in itertools.count(1):
+        yield os.path.join(reports_dir, f"{stem}_{counter}.pdf")
+
+
+def publish(temp_path, paths):
+    # Linking, unlike renaming, fails when the name is taken, so each of
+    # concurrent reports gets a name of its own and only ever a finished
+    # file appears under it
+    for path in paths:
+        try:
+            os.link(temp_path, path)
+        except FileExistsError:
+            continue
+        os.remove(temp_path)
+        return path
+
+
+def scaled_image(buffer, width=6 * inch):
+    # Adjust the chart size without stretching
+    aspect_ratio = CHART_SIZE[0] / CHART_SIZE[1]
+    return Image(buffer, width=width, height=width / aspect_ratio)
+
+
+class ReportEngine:
+    """Renders sampling reports to PDF.
+
+    Fonts, styles and the text that is the same in every report are set
+    up once, when the engine is created, and shared by all the reports
+    it renders.
+    """
+
+    def __init__(self):
+        register_fonts()
+        self.styles = build_styles()
+        self.grid_style = TableStyle(
+            [("GRID", (0, 0), (-1, -1), 1, (0, 0, 0))]
+        )
+        self.title = Paragraph(
+            "Image Quality Sampling Report", self.styles["Title"]
+        )
+        self.tables_heading = Paragraph("Πίνακες", self.styles["Heading2"])
+        self.checked_heading = Paragraph(
+            "Εικόνες που ελέχθηκαν:", self.styles["Heading3"]
+        )
+        self.rejected_heading = Paragraph(
+            "Εικόνες που απορρίφθηκαν:", self.styles["Heading3"]
+        )
+        self.graphs_heading = Paragraph("Graphs", self.styles["Heading2"])
+        self.closing = Paragraph(CLOSING_TEXT, self.styles["Normal"])
+
+    def render(self, data, output=None, reports_dir=None):
+        """Writes the report of ``data`` and returns its path.
+
+        Without an output path the report gets a name of its own in the
+        reports directory. It is built in a temporary file next to the
+        output and only put in place once complete, so a crash leaves at
+        most the ``.tmp`` file behind, never a partial report.
+        """
+        if output is None:
+            names = report_names(data, reports_dir)
+            target = next(names)
+            names = itertools.chain([target], names)
+        else:
+            target = output = os.path.abspath(output)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.{secrets.token_hex(4)}.tmp"
+        # Taken exclusively with the usual file permissions, reportlab
+        # then writes into it
+        os.close(os.open(temp_path, os.O_CREAT | os.O_EXCL, 0o644))
+        try:
+            self.build(data, temp_path)
+            if output is None:
+                output = publish(temp_path, names)
+            else:
+                os.replace(temp_path, output)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return output
+
+    def build(self, data, filename):
+        styles = self.styles
+        doc = SimpleDocTemplate(
+            filename,
+            pagesize=A4,
+            rightMargin=30,
+            leftMargin=30,
+            topMargin=30,
+            bottomMargin=18,
+        )
+
+        story = []
+
+        # Title, Timestamp and Root Folder
+        timestamp = Paragraph(
+            f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            styles["Normal"],
+        )
+        root_folder = Paragraph(
+            f"Root Folder: {data['Batch Name']}", styles["Normal"]
+        )
+        story.extend([self.title, Spacer(1, inch), timestamp, root_folder])
+
+        # General Info
+        for key, value in data.items():
+            if key not in ["Checked Images", "Rejected Images"]:
+                p = Paragraph(f"{key}: {value}", styles["BodyText"])
+                story.append(p)
+        story.append(PageBreak())
+
+        # Tables
+        story.append(self.tables_heading)
+        story.append(Spacer(0.5, inch))
+        story.append(self.checked_heading)
+        checked_table_data = [["Checked Images"]] + [
+            [
+                os.path.join(
+                    os.path.basename(os.path.dirname(img)),
+                    os.path.basename(img),
+                )
+            ]
+            for img in data["Checked Images"]
         ]
-        for img in data["Checked Images"]
-    ]
-    checked_table = Table(checked_table_data, colWidths=[6 * inch])
-    checked_table.setStyle(
-        TableStyle([("GRID", (0, 0), (-1, -1), 1, (0, 0, 0))])
-    )
-    story.extend([checked_table, PageBreak()])
-
-    story.append(Paragraph("Εικόνες που απορρίφθηκαν:", styles["Heading3"]))
-    rejected_table_data = [["Rejected Image", "Reason"]] + [
-        [
-            os.path.join(
-                os.path.basename(os.path.dirname(img)), os.path.basename(img)
-            ),
-            reason,
+        checked_table = Table(checked_table_data, colWidths=[6 * inch])
+        checked_table.setStyle(self.grid_style)
+        story.extend([checked_table, PageBreak()])
+
+        story.append(self.rejected_heading)
+        rejected_table_data = [["Rejected Image", "Reason"]] + [
+            [
+                os.path.join(
+                    os.path.basename(os.path.dirname(img)),
+                    os.path.basename(img),
+                ),
+                reason,
+            ]
+            for img, reason in data["Rejected Images"]
         ]
-        for img, reason in data["Rejected Images"]
-    ]
-    rejected_table = Table(rejected_table_data, colWidths=[4 * inch, 2 * inch])
-    rejected_table.setStyle(
-        TableStyle([("GRID", (0, 0), (-1, -1), 1, (0, 0, 0))])
-    )
-    story.extend([rejected_table, PageBreak()])
-
-    # Graphs
-    pie_buffer, bar_buffer = generate_charts(data)
-    story.append(Paragraph("Graphs", styles["Heading2"]))
-    story.append(Spacer(1, inch))
-
-    # Adjust pie image size without stretching
-    pie_image = PILImage.open(pie_buffer)
-    pie_aspect_ratio = pie_image.width / pie_image.height
-    pie_width = 6 * inch
-    pie_height = pie_width / pie_aspect_ratio
-    pie = Image(pie_buffer, width=pie_width, height=pie_height)
-
-    # Adjust bar image size without stretching
-    bar_image = PILImage.open(bar_buffer)
-    bar_aspect_ratio = bar_image.width / bar_image.height
-    bar_width = 6 * inch
-    bar_height = bar_width / bar_aspect_ratio
-    bar = Image(bar_buffer, width=bar_width, height=bar_height)
-
-    story.extend([pie, Spacer(1, inch), bar, PageBreak()])
-
-    # Placeholder Text and Signature
-    lorem_text = "Lorem ipsum dolor sit amet, consectetur adipiscing elit."
-    story.append(Paragraph(lorem_text, styles["Normal"]))
-    story.append(Spacer(1, inch))
-    user1 = Paragraph(
-        f"{data['User 1']} Υπογραφή: ___________________________",
-        styles["Normal"],
-    )
-    user2 = Paragraph(
-        f"{data['User 2']} Υπογραφή: ___________________________",
-        styles["Normal"],
-    )
-    story.extend([user1, Spacer(1, inch), user2])
+        rejected_table = Table(
+            rejected_table_data, colWidths=[4 * inch, 2 * inch]
+        )
+        rejected_table.setStyle(self.grid_style)
+        story.extend([rejected_table, PageBreak()])
+
+        # Graphs
+        pie_buffer, bar_buffer, oc_buffer = generate_charts(data)
+        story.append(self.graphs_heading)
+        story.append(Spacer(1, inch))
+        pie = scaled_image(pie_buffer)
+        bar = scaled_image(bar_buffer)
+        oc = scaled_image(oc_buffer)
+        story.extend([pie, Spacer(1, inch), bar, PageBreak(), oc, PageBreak()])
+
+        # Placeholder Text and Signature
+        story.append(self.closing)
+        story.append(Spacer(1, inch))
+        user1 = Paragraph(
+            f"{data['User 1']} Υπογραφή: ___________________________",
+            styles["Normal"],
+        )
+        user2 = Paragraph(
+            f"{data['User 2']} Υπογραφή: ___________________________",
+            styles["Normal"],
+        )
+        story.extend([user1, Spacer(1, inch), user2])
+
+        doc.build(story)
+
+    def render_many(self, sessions, outputs=None, reports_dir=None):
+        """Renders the report of each session to the matching output.
+
+        Without outputs every report is named in the reports directory.
+        Returns the paths written, in order.
+        """
+        sessions = list(sessions)
+        outputs = [None] * len(sessions) if outputs is None else list(outputs)
+        if len(sessions) != len(outputs):
+            raise ValueError("Expected one output per session")
+        return [
+            self.render(data, output, reports_dir)
+            for data, output in zip(sessions, outputs)
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def default_engine():
+    return ReportEngine()
+
 
-    doc.build(story)
+def generate_pdf(data, output=None, reports_dir=None):
+    return default_engine().render(data, output, reports_dir)
 
 
-def create_report(data):
-    generate_pdf(data)
+def create_report(data, output=None, reports_dir=None):
+    return generate_pdf(data, output, reports_dir)
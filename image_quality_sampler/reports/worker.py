@@ -0,0 +1,12 @@
+"""Functions run by the report worker processes.
+
+Kept apart from visualize, so submitting a report loads neither
+matplotlib nor reportlab in the GUI, and from the GUI, so the workers
+never import Qt.
+"""
+
+
+def create_report(data, output=None, reports_dir=None):
+    from image_quality_sampler.reports import visualize
+
+    return visualize.create_report(data, output, reports_dir)
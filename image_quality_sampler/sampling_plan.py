@@ -0,0 +1,551 @@
+import bisect
+from types import MappingProxyType
+from typing import Any, Dict, List
+
+# ISO 2859-1 tables, as entered from the standard. They are compiled into
+# the lookup structures below once, at import time.
+
+# Sample size code letter per inspection level, by lot size range
+LOT_SIZE_RANGES: List[Dict[str, Any]] = [
+    {
+        "levels": {
+            "I": "A",
+            "II": "A",
+            "III": "B",
+            "S1": "A",
+            "S2": "A",
+            "S3": "A",
+            "S4": "A",
+        },
+        "min": 2,
+        "max": 8,
+    },
+    {
+        "levels": {
+            "I": "A",
+            "II": "B",
+            "III": "C",
+            "S1": "A",
+            "S2": "A",
+            "S3": "A",
+            "S4": "A",
+        },
+        "min": 9,
+        "max": 15,
+    },
+    {
+        "levels": {
+            "I": "B",
+            "II": "C",
+            "III": "D",
+            "S1": "A",
+            "S2": "A",
+            "S3": "B",
+            "S4": "B",
+        },
+        "min": 16,
+        "max": 25,
+    },
+    {
+        "levels": {
+            "I": "C",
+            "II": "D",
+            "III": "E",
+            "S1": "A",
+            "S2": "B",
+            "S3": "B",
+            "S4": "C",
+        },
+        "min": 26,
+        "max": 50,
+    },
+    {
+        "levels": {
+            "I": "C",
+            "II": "E",
+            "III": "F",
+            "S1": "B",
+            "S2": "B",
+            "S3": "C",
+            "S4": "C",
+        },
+        "min": 51,
+        "max": 90,
+    },
+    {
+        "levels": {
+            "I": "D",
+            "II": "F",
+            "III": "G",
+            "S1": "B",
+            "S2": "B",
+            "S3": "C",
+            "S4": "D",
+        },
+        "min": 91,
+        "max": 150,
+    },
+    {
+        "levels": {
+            "I": "E",
+            "II": "G",
+            "III": "H",
+            "S1": "B",
+            "S2": "C",
+            "S3": "D",
+            "S4": "E",
+        },
+        "min": 151,
+        "max": 280,
+    },
+    {
+        "levels": {
+            "I": "F",
+            "II": "H",
+            "III": "J",
+            "S1": "B",
+            "S2": "C",
+            "S3": "D",
+            "S4": "E",
+        },
+        "min": 281,
+        "max": 500,
+    },
+    {
+        "levels": {
+            "I": "G",
+            "II": "J",
+            "III": "K",
+            "S1": "C",
+            "S2": "C",
+            "S3": "E",
+            "S4": "F",
+        },
+        "min": 501,
+        "max": 1200,
+    },
+    {
+        "levels": {
+            "I": "H",
+            "II": "K",
+            "III": "L",
+            "S1": "C",
+            "S2": "D",
+            "S3": "E",
+            "S4": "G",
+        },
+        "min": 1201,
+        "max": 3200,
+    },
+    {
+        "levels": {
+            "I": "J",
+            "II": "L",
+            "III": "M",
+            "S1": "C",
+            "S2": "D",
+            "S3": "F",
+            "S4": "G",
+        },
+        "min": 3201,
+        "max": 10000,
+    },
+    {
+        "levels": {
+            "I": "K",
+            "II": "M",
+            "III": "N",
+            "S1": "C",
+            "S2": "D",
+            "S3": "F",
+            "S4": "H",
+        },
+        "min": 10001,
+        "max": 35000,
+    },
+    {
+        "levels": {
+            "I": "L",
+            "II": "N",
+            "III": "P",
+            "S1": "D",
+            "S2": "E",
+            "S3": "G",
+            "S4": "J",
+        },
+        "min": 35001,
+        "max": 150000,
+    },
+    {
+        "levels": {
+            "I": "M",
+            "II": "P",
+            "III": "Q",
+            "S1": "D",
+            "S2": "E",
+            "S3": "G",
+            "S4": "J",
+        },
+        "min": 150001,
+        "max": 500000,
+    },
+    {
+        "levels": {
+            "I": "N",
+            "II": "Q",
+            "III": "R",
+            "S1": "D",
+            "S2": "E",
+            "S3": "H",
+            "S4": "K",
+        },
+        "min": 500001,
+        "max": -1,
+    },
+]
+
+# Sample size per code letter
+SAMPLE_SIZES = {
+    "A": 2,
+    "B": 3,
+    "C": 5,
+    "D": 8,
+    "E": 13,
+    "F": 20,
+    "G": 32,
+    "H": 50,
+    "J": 80,
+    "K": 125,
+    "L": 200,
+    "M": 315,
+    "N": 500,
+    "P": 800,
+    "Q": 1250,
+    "R": 2000,
+}
+
+# Acceptance and rejection numbers per sample size and AQL. "ss" follows
+# the arrows of the standard to the sample size the numbers belong to.
+AQL_NUMBERS: List[Dict[str, Any]] = [
+    {
+        "lotSize": 2,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 0, "reject": 1, "ss": 80},
+            "0.25": {"accept": 0, "reject": 1, "ss": 50},
+            "0.40": {"accept": 0, "reject": 1, "ss": 32},
+            "0.65": {"accept": 0, "reject": 1, "ss": 20},
+            "1.0": {"accept": 0, "reject": 1, "ss": 13},
+            "1.5": {"accept": 0, "reject": 1, "ss": 8},
+            "2.5": {"accept": 0, "reject": 1, "ss": 5},
+            "4.0": {"accept": 0, "reject": 1, "ss": 3},
+            "6.5": {"accept": 0, "reject": 1},
+        },
+    },
+    {
+        "lotSize": 3,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 0, "reject": 1, "ss": 80},
+            "0.25": {"accept": 0, "reject": 1, "ss": 50},
+            "0.40": {"accept": 0, "reject": 1, "ss": 32},
+            "0.65": {"accept": 0, "reject": 1, "ss": 20},
+            "1.0": {"accept": 0, "reject": 1, "ss": 13},
+            "1.5": {"accept": 0, "reject": 1, "ss": 8},
+            "2.5": {"accept": 0, "reject": 1, "ss": 5},
+            "4.0": {"accept": 0, "reject": 1},
+            "6.5": {"accept": 0, "reject": 1, "ss": 2},
+        },
+    },
+    {
+        "lotSize": 5,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 0, "reject": 1, "ss": 80},
+            "0.25": {"accept": 0, "reject": 1, "ss": 50},
+            "0.40": {"accept": 0, "reject": 1, "ss": 32},
+            "0.65": {"accept": 0, "reject": 1, "ss": 20},
+            "1.0": {"accept": 0, "reject": 1, "ss": 13},
+            "1.5": {"accept": 0, "reject": 1, "ss": 8},
+            "2.5": {"accept": 0, "reject": 1},
+            "4.0": {"accept": 0, "reject": 1, "ss": 3},
+            "6.5": {"accept": 1, "reject": 2, "ss": 8},
+        },
+    },
+    {
+        "lotSize": 8,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 0, "reject": 1, "ss": 80},
+            "0.25": {"accept": 0, "reject": 1, "ss": 50},
+            "0.40": {"accept": 0, "reject": 1, "ss": 32},
+            "0.65": {"accept": 0, "reject": 1, "ss": 20},
+            "1.0": {"accept": 0, "reject": 1, "ss": 13},
+            "1.5": {"accept": 0, "reject": 1},
+            "2.5": {"accept": 0, "reject": 1, "ss": 5},
+            "4.0": {"accept": 1, "reject": 2, "ss": 13},
+            "6.5": {"accept": 1, "reject": 2},
+        },
+    },
+    {
+        "lotSize": 13,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 0, "reject": 1, "ss": 80},
+            "0.25": {"accept": 0, "reject": 1, "ss": 50},
+            "0.40": {"accept": 0, "reject": 1, "ss": 32},
+            "0.65": {"accept": 0, "reject": 1, "ss": 20},
+            "1.0": {"accept": 0, "reject": 1},
+            "1.5": {"accept": 0, "reject": 1, "ss": 8},
+            "2.5": {"accept": 1, "reject": 2, "ss": 20},
+            "4.0": {"accept": 1, "reject": 2},
+            "6.5": {"accept": 2, "reject": 3},
+        },
+    },
+    {
+        "lotSize": 20,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 0, "reject": 1, "ss": 80},
+            "0.25": {"accept": 0, "reject": 1, "ss": 50},
+            "0.40": {"accept": 0, "reject": 1, "ss": 32},
+            "0.65": {"accept": 0, "reject": 1},
+            "1.0": {"accept": 0, "reject": 1, "ss": 13},
+            "1.5": {"accept": 1, "reject": 2, "ss": 32},
+            "2.5": {"accept": 1, "reject": 2},
+            "4.0": {"accept": 2, "reject": 3},
+            "6.5": {"accept": 3, "reject": 4},
+        },
+    },
+    {
+        "lotSize": 32,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 0, "reject": 1, "ss": 80},
+            "0.25": {"accept": 0, "reject": 1, "ss": 50},
+            "0.40": {"accept": 0, "reject": 1},
+            "0.65": {"accept": 0, "reject": 1, "ss": 20},
+            "1.0": {"accept": 1, "reject": 2, "ss": 50},
+            "1.5": {"accept": 1, "reject": 2},
+            "2.5": {"accept": 2, "reject": 3},
+            "4.0": {"accept": 3, "reject": 4},
+            "6.5": {"accept": 5, "reject": 6},
+        },
+    },
+    {
+        "lotSize": 50,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 0, "reject": 1, "ss": 80},
+            "0.25": {"accept": 0, "reject": 1},
+            "0.40": {"accept": 0, "reject": 1, "ss": 32},
+            "0.65": {"accept": 1, "reject": 2, "ss": 80},
+            "1.0": {"accept": 1, "reject": 2},
+            "1.5": {"accept": 2, "reject": 3},
+            "2.5": {"accept": 3, "reject": 4},
+            "4.0": {"accept": 5, "reject": 6},
+            "6.5": {"accept": 7, "reject": 8},
+        },
+    },
+    {
+        "lotSize": 80,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 0, "reject": 1},
+            "0.25": {"accept": 0, "reject": 1, "ss": 50},
+            "0.40": {"accept": 1, "reject": 2, "ss": 125},
+            "0.65": {"accept": 1, "reject": 2},
+            "1.0": {"accept": 2, "reject": 3},
+            "1.5": {"accept": 3, "reject": 4},
+            "2.5": {"accept": 5, "reject": 6},
+            "4.0": {"accept": 7, "reject": 8},
+            "6.5": {"accept": 10, "reject": 11},
+        },
+    },
+    {
+        "lotSize": 125,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 0, "reject": 1},
+            "0.15": {"accept": 0, "reject": 1, "ss": 80},
+            "0.25": {"accept": 1, "reject": 2, "ss": 200},
+            "0.40": {"accept": 1, "reject": 2},
+            "0.65": {"accept": 2, "reject": 3},
+            "1.0": {"accept": 3, "reject": 4},
+            "1.5": {"accept": 5, "reject": 6},
+            "2.5": {"accept": 7, "reject": 8},
+            "4.0": {"accept": 10, "reject": 11},
+            "6.5": {"accept": 14, "reject": 15},
+        },
+    },
+    {
+        "lotSize": 200,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1},
+            "0.10": {"accept": 0, "reject": 1, "ss": 125},
+            "0.15": {"accept": 1, "reject": 2, "ss": 315},
+            "0.25": {"accept": 1, "reject": 2},
+            "0.40": {"accept": 2, "reject": 3},
+            "0.65": {"accept": 3, "reject": 4},
+            "1.0": {"accept": 5, "reject": 6},
+            "1.5": {"accept": 7, "reject": 8},
+            "2.5": {"accept": 10, "reject": 11},
+            "4.0": {"accept": 14, "reject": 15},
+            "6.5": {"accept": 21, "reject": 22},
+        },
+    },
+    {
+        "lotSize": 315,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 0, "reject": 1, "ss": 200},
+            "0.10": {"accept": 1, "reject": 2, "ss": 500},
+            "0.15": {"accept": 1, "reject": 2},
+            "0.25": {"accept": 2, "reject": 3},
+            "0.40": {"accept": 3, "reject": 4},
+            "0.65": {"accept": 5, "reject": 6},
+            "1.0": {"accept": 7, "reject": 8},
+            "1.5": {"accept": 10, "reject": 11},
+            "2.5": {"accept": 14, "reject": 15},
+            "4.0": {"accept": 21, "reject": 22},
+            "6.5": {"accept": 21, "reject": 22, "ss": 200},
+        },
+    },
+    {
+        "lotSize": 500,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 1, "reject": 2, "ss": 800},
+            "0.10": {"accept": 1, "reject": 2},
+            "0.15": {"accept": 2, "reject": 3},
+            "0.25": {"accept": 3, "reject": 4},
+            "0.40": {"accept": 5, "reject": 6},
+            "0.65": {"accept": 7, "reject": 8},
+            "1.0": {"accept": 10, "reject": 11},
+            "1.5": {"accept": 14, "reject": 15},
+            "2.5": {"accept": 21, "reject": 22},
+            "4.0": {"accept": 21, "reject": 22, "ss": 315},
+            "6.5": {"accept": 21, "reject": 22, "ss": 200},
+        },
+    },
+    {
+        "lotSize": 800,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 1, "reject": 2},
+            "0.10": {"accept": 2, "reject": 3},
+            "0.15": {"accept": 3, "reject": 4},
+            "0.25": {"accept": 5, "reject": 6},
+            "0.40": {"accept": 7, "reject": 8},
+            "0.65": {"accept": 10, "reject": 11},
+            "1.0": {"accept": 14, "reject": 15},
+            "1.5": {"accept": 21, "reject": 22},
+            "2.5": {"accept": 21, "reject": 22, "ss": 500},
+            "4.0": {"accept": 21, "reject": 22, "ss": 315},
+            "6.5": {"accept": 21, "reject": 22, "ss": 200},
+        },
+    },
+    {
+        "lotSize": 1250,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 2, "reject": 3},
+            "0.10": {"accept": 3, "reject": 4},
+            "0.15": {"accept": 5, "reject": 6},
+            "0.25": {"accept": 7, "reject": 8},
+            "0.40": {"accept": 10, "reject": 11},
+            "0.65": {"accept": 14, "reject": 15},
+            "1.0": {"accept": 21, "reject": 22},
+            "1.5": {"accept": 21, "reject": 22, "ss": 800},
+            "2.5": {"accept": 21, "reject": 22, "ss": 500},
+            "4.0": {"accept": 21, "reject": 22, "ss": 315},
+            "6.5": {"accept": 21, "reject": 22, "ss": 200},
+        },
+    },
+    {
+        "lotSize": 2000,
+        "numbers": {
+            "0": {"accept": 0, "reject": 0},
+            "0.065": {"accept": 3, "reject": 4},
+            "0.10": {"accept": 5, "reject": 6},
+            "0.15": {"accept": 7, "reject": 8},
+            "0.25": {"accept": 10, "reject": 11},
+            "0.40": {"accept": 14, "reject": 15},
+            "0.65": {"accept": 21, "reject": 22},
+            "1.0": {"accept": 21, "reject": 22, "ss": 1250},
+            "1.5": {"accept": 21, "reject": 22, "ss": 800},
+            "2.5": {"accept": 21, "reject": 22, "ss": 500},
+            "4.0": {"accept": 21, "reject": 22, "ss": 315},
+            "6.5": {"accept": 21, "reject": 22, "ss": 200},
+        },
+    },
+]
+
+
+def compile_plans():
+    numbers = {row["lotSize"]: row["numbers"] for row in AQL_NUMBERS}
+    plans = {}
+    for letter, default_sample_size in SAMPLE_SIZES.items():
+        for aql, plan in numbers.get(default_sample_size, {}).items():
+            plans[letter, aql] = (
+                plan.get("ss", default_sample_size),
+                plan["accept"],
+                plan["reject"],
+            )
+    return MappingProxyType(plans)
+
+
+# Lower bound of every lot size range, for bisect
+LOT_MINIMUMS = tuple(lot["min"] for lot in LOT_SIZE_RANGES)
+LOT_MAXIMUMS = tuple(lot["max"] for lot in LOT_SIZE_RANGES)
+LOT_LEVELS = tuple(
+    MappingProxyType(dict(lot["levels"])) for lot in LOT_SIZE_RANGES
+)
+# (code letter, AQL) -> (sample size, accept, reject)
+PLANS = compile_plans()
+AQLS = tuple(AQL_NUMBERS[0]["numbers"])
+INSPECTION_LEVELS = tuple(LOT_SIZE_RANGES[0]["levels"])
+
+
+def get_code_letter(lot_size, inspection_level):
+    index = bisect.bisect_right(LOT_MINIMUMS, lot_size) - 1
+    if index < 0:
+        return None
+    if LOT_MAXIMUMS[index] != -1 and lot_size > LOT_MAXIMUMS[index]:
+        return None
+    return LOT_LEVELS[index][inspection_level]
+
+
+def get_sample_size_and_acceptance(lot_size, inspection_level, AQL):
+    letter = get_code_letter(lot_size, inspection_level)
+    plan = PLANS.get((letter, AQL))
+    if plan is None:
+        return None, None, None
+    sample_size, accept, reject = plan
+    return min(sample_size, lot_size), accept, reject
+
+
+class SamplingPlan:
+    # Kept for existing callers, the tables are shared module state
+    def get_sample_size_and_acceptance(self, lot_size, inspection_level, AQL):
+        return get_sample_size_and_acceptance(lot_size, inspection_level, AQL)
@@ -0,0 +1,163 @@
+import itertools
+import math
+import mimetypes
+import os
+import random
+
+from image_quality_sampler import config
+
+IMAGE_EXTENSIONS = frozenset(ext.lower() for ext in config.IMAGE_EXTENSIONS)
+
+# Resolved once so classifying a file is a single set/dict lookup
+IMAGE_TYPES = {
+    ext: mimetypes.types_map.get(ext, "image/" + ext[1:])
+    for ext in IMAGE_EXTENSIONS
+}
+
+
+def get_image_type(name, extensions=IMAGE_EXTENSIONS):
+    ext = os.path.splitext(name)[1].lower()
+    if ext in extensions:
+        return IMAGE_TYPES.get(ext, "image/" + ext[1:])
+    return None
+
+
+def is_image(name, extensions=IMAGE_EXTENSIONS):
+    return os.path.splitext(name)[1].lower() in extensions
+
+
+def iter_image_entries(path, extensions=IMAGE_EXTENSIONS, ordered=False):
+    # DirEntry type info comes from the directory listing, no stat calls.
+    # ordered walks every folder by name, so the sequence is the same on
+    # any filesystem while only one listing is held at a time.
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            if ordered:
+                entries = sorted(entries, key=lambda entry: entry.name)
+            folders = []
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in extensions:
+                    yield entry
+        stack.extend(reversed(folders) if ordered else folders)
+
+
+def iter_images(path, extensions=IMAGE_EXTENSIONS, ordered=False):
+    for entry in iter_image_entries(path, extensions, ordered):
+        yield entry.path
+
+
+def count_images(path, extensions=IMAGE_EXTENSIONS):
+    return sum(1 for _ in iter_image_entries(path, extensions))
+
+
+def scan_tree(root_path, top, known_dirs=None, extensions=IMAGE_EXTENSIONS):
+    """Inventory root_path/top, re-listing only folders that changed.
+
+    known_dirs maps relative folder paths to (parent, mtime, image_count)
+    from a previous scan. Returns the same mapping for every folder seen
+    and, for the folders that were listed again, their image rows as
+    (path, size, mtime, file_type) tuples.
+    """
+    known_dirs = known_dirs or {}
+    children = {}
+    for path, (parent, _, _) in known_dirs.items():
+        children.setdefault(parent, []).append(path)
+
+    directories = {}
+    images = {}
+    stack = [(top, None)]
+    while stack:
+        rel_path, parent = stack.pop()
+        full_path = os.path.join(root_path, rel_path)
+        try:
+            mtime = os.stat(full_path).st_mtime_ns
+        except OSError:
+            continue  # Removed while scanning
+        known = known_dirs.get(rel_path)
+        if known and known[0] == parent and known[1] == mtime:
+            directories[rel_path] = known
+            stack.extend(
+                (child, rel_path) for child in children.get(rel_path, [])
+            )
+            continue
+
+        rows = []
+        with os.scandir(full_path) as entries:
+            for entry in entries:
+                entry_path = os.path.join(rel_path, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry_path, rel_path))
+                    continue
+                file_type = get_image_type(entry.name, extensions)
+                if file_type:
+                    stat = entry.stat()
+                    rows.append(
+                        (entry_path, stat.st_size, stat.st_mtime_ns, file_type)
+                    )
+        directories[rel_path] = (parent, mtime, len(rows))
+        images[rel_path] = rows
+    return directories, images
+
+
+def analyze_batch(item_path, known_dirs=None):
+    # Module level so it can run in a process pool
+    root_path, batch_name = os.path.split(item_path)
+    directories, images = scan_tree(root_path, batch_name, known_dirs)
+    return {
+        "batch_name": batch_name,
+        "subfolder_count": sum(
+            1 for parent, _, _ in directories.values() if parent == batch_name
+        ),
+        "image_count": sum(count for _, _, count in directories.values()),
+        "directories": directories,
+        "images": images,
+    }
+
+
+def reservoir_sample(iterable, sample_size, rng=random):
+    """Draws ``sample_size`` items uniformly from ``iterable`` in one pass.
+
+    Uses Algorithm L, which skips ahead between replacements, so memory
+    is O(sample_size) and only O(sample_size * log(n / sample_size))
+    random numbers are drawn. Raises ValueError like ``random.sample``
+    when there are fewer items than requested.
+    """
+    iterator = iter(iterable)
+    reservoir = list(itertools.islice(iterator, sample_size))
+    if len(reservoir) < sample_size:
+        raise ValueError("Sample larger than population")
+    if sample_size == 0:
+        return reservoir
+
+    def uniform():
+        # Open interval (0, 1), both logarithms below stay finite
+        while True:
+            value = rng.random()
+            if value > 0.0:
+                return value
+
+    weight = math.exp(math.log(uniform()) / sample_size)
+    while True:
+        skip = math.floor(math.log(uniform()) / math.log1p(-weight))
+        item = next(itertools.islice(iterator, skip, None), reservoir)
+        if item is reservoir:
+            break  # Exhausted
+        reservoir[rng.randrange(sample_size)] = item
+        weight *= math.exp(math.log(uniform()) / sample_size)
+    # Inspection order should not follow the folder order
+    rng.shuffle(reservoir)
+    return reservoir
+
+
+def select_random_images(folder_path, sample_size, seed=None):
+    # With a seed the same folder contents always give the same sample
+    rng = random.Random(seed)
+    images = iter_images(folder_path, ordered=seed is not None)
+    return reservoir_sample(images, sample_size, rng)
@@ -1,80 +1,300 @@
-import mimetypes
 import os
+import threading
 import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
+from image_quality_sampler import config, scanner
 from image_quality_sampler.db.database_manager import DatabaseManager
+from image_quality_sampler.event_queue import BatchEventQueue
 
 
 class Watcher:
     def __init__(self):
         self.event_handler = FileSystemEventHandler()
         self.event_handler.on_modified = self.on_modified
+        self.event_handler.on_created = self.on_created
+        self.event_handler.on_deleted = self.on_deleted
+        self.event_handler.on_moved = self.on_moved
         self.observer = None
+        self.folder_path = None
+        # Created lazily so the watcher stays picklable for Process
+        self.queue = None
+        self.local = None
+        # Connection the GUI listens on for batch changes, see run()
+        self.notify = None
         print("Watcher Initialized")
 
     def get_db(self):
-        return DatabaseManager()
+        # One long-lived connection per thread (main loop and queue
+        # worker), so handling events does no connection setup
+        if self.local is None:
+            self.local = threading.local()
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.local.db = DatabaseManager()
+        return db
+
+    def close_db(self):
+        # Closes the calling thread's connection only
+        db = getattr(self.local, "db", None)
+        if db is not None:
+            self.local.db = None
+            db.close()
+
+    def get_batch_name(self, path):
+        # Map an event path to the BATCH folder it lives in
+        if not self.folder_path:
+            return None
+        rel_path = os.path.relpath(path, self.folder_path)
+        if rel_path == os.curdir or rel_path.startswith(os.pardir):
+            return None
+        batch_name = rel_path.split(os.sep)[0]
+        return batch_name if batch_name.startswith("BATCH") else None
+
+    def get_depth(self, path):
+        # 0 for a batch folder itself, 1 for its direct children and so on
+        rel_path = os.path.relpath(path, self.folder_path)
+        return rel_path.count(os.sep)
+
+    def is_image(self, path):
+        return scanner.is_image(path)
 
     def on_modified(self, event):
-        # Only react to changes in directories (not individual files)
-        if event.is_directory:
-            self.update_db()
+        # Only the root listing matters here, file events keep the counts
+        if event.is_directory and self.folder_path:
+            if os.path.normpath(event.src_path) == os.path.normpath(
+                self.folder_path
+            ):
+                self.queue.put_root()
+
+    def on_created(self, event):
+        self.queue_created(event.src_path, event.is_directory)
+
+    def on_deleted(self, event):
+        self.queue_deleted(event.src_path, event.is_directory)
+
+    def on_moved(self, event):
+        # Contents of moved folders are replayed as synthetic file moves
+        self.queue_deleted(event.src_path, event.is_directory, True)
+        self.queue_created(event.dest_path, event.is_directory)
+
+    def queue_created(self, path, is_directory):
+        batch_name = self.get_batch_name(path)
+        if not batch_name:
+            return
+        depth = self.get_depth(path)
+        if depth == 0:
+            if is_directory:
+                self.queue.put(batch_name, created=True)
+        elif is_directory:
+            if depth == 1:
+                self.queue.put(batch_name, folder_delta=1)
+        elif self.is_image(path):
+            self.queue.put(batch_name, image_delta=1, image_path=path)
+
+    def queue_deleted(self, path, is_directory, moved=False):
+        batch_name = self.get_batch_name(path)
+        if not batch_name:
+            return
+        depth = self.get_depth(path)
+        if depth == 0:
+            self.queue.put(batch_name, removed=True)
+        elif is_directory:
+            if not moved:
+                # Nothing tells us what the removed folder contained
+                self.queue.put(batch_name, rescan=True)
+            elif depth == 1:
+                self.queue.put(batch_name, folder_delta=-1)
+        elif self.is_image(path):
+            self.queue.put(batch_name, image_delta=-1, image_path=path)
+        elif not os.path.splitext(path)[1]:
+            # Some platforms report removed folders as file deletions
+            self.queue.put(batch_name, rescan=True)
+
+    def create_queue(self):
+        # The worker's connection is closed by the worker itself
+        self.queue = BatchEventQueue(
+            self.process_changes, on_stop=self.close_db
+        )
+        return self.queue
+
+    def process_changes(self, changes, root_change):
+        try:
+            if root_change == "full":
+                self.update_db()
+                return
+            changed_batches = set(changes)
+            scanned = set()
+            if root_change == "sync":
+                scanned, removed = self.sync_batch_list()
+                changed_batches.update(scanned, removed)
+            for batch_name, change in changes.items():
+                # A batch scanned just now already includes the events
+                # queued for its contents, their deltas would count twice
+                if batch_name not in scanned:
+                    self.apply_change(batch_name, change)
+            self.notify_changes(changed_batches)
+        except Exception as e:
+            # A lost update leaves the counts unreliable, walk everything
+            print(f"Error applying changes, scheduling full scan: {e}")
+            self.queue.put_root(full_scan=True)
+        print(f"Watcher stats: {self.queue.stats()}")
+
+    def apply_change(self, batch_name, change):
+        if change["removed"]:
+            db = self.get_db()
+            db.delete_batch(batch_name)
+        elif change["rescan"]:
+            self.update_batch_in_db(batch_name)
+        else:
+            if change["created"]:
+                self.insert_empty_batch(batch_name)
+            if (
+                change["folder_delta"]
+                or change["image_delta"]
+                or change["images"]
+            ):
+                self.adjust_batch_counts(
+                    batch_name,
+                    change["folder_delta"],
+                    change["image_delta"],
+                    change["images"],
+                )
+
+    def insert_empty_batch(self, batch_name):
+        # Its contents follow as separate created events
+        db = self.get_db()
+        if not db.get_batch(batch_name):
+            db.insert_batch(batch_name, 0, 0, "0", "PENDING")
+
+    def adjust_batch_counts(
+        self, batch_name, folder_delta, image_delta, images=None
+    ):
+        db = self.get_db()
+        existing_batch = db.get_batch(batch_name)
+        if existing_batch:
+            added, removed = self.image_rows(images or {})
+            db.adjust_batch_counts(
+                batch_name, folder_delta, image_delta, added, removed
+            )
+        if not existing_batch:
+            self.update_batch_in_db(batch_name)
+
+    def image_rows(self, images):
+        # Inventory rows of the images added and paths of those removed,
+        # relative to the root folder like the scan's
+        added = []
+        removed = []
+        for path, is_added in images.items():
+            rel_path = os.path.relpath(path, self.folder_path)
+            if not is_added:
+                removed.append(rel_path)
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                removed.append(rel_path)  # Gone again already
+                continue
+            added.append(
+                (
+                    rel_path,
+                    os.path.dirname(rel_path),
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    scanner.get_image_type(path),
+                )
+            )
+        return added, removed
+
+    def update_batch_in_db(self, batch_name):
+        batch_path = os.path.join(self.folder_path, batch_name)
+        db = self.get_db()
+        if os.path.isdir(batch_path):
+            known_dirs = db.get_directories(batch_name)
+            self.store_batch(db, self.analyze_batch(batch_path, known_dirs))
+        else:
+            db.delete_batch(batch_name)
+
+    def store_batch(self, db, data):
+        db.sync_batches([data])
+
+    def sync_batch_list(self):
+        # Pick up added and removed batches without walking existing ones
+        db = self.get_db()
+        known_batches = {batch[1] for batch in db.get_all_batches()}
+        existing_folders = self.list_batch_folders(self.folder_path)
+        scan_results = [
+            self.analyze_batch(os.path.join(self.folder_path, batch_name))
+            for batch_name in existing_folders
+            if batch_name not in known_batches
+        ]
+        db.sync_batches(scan_results, existing_folders)
+        # Names of the batches scanned and of those removed
+        return (
+            set(existing_folders) - known_batches,
+            known_batches - set(existing_folders),
+        )
 
     def update_db(self):
         db = self.get_db()
         batch_folder = self.get_folder_path_from_db()
         if batch_folder:
-            batch_data = self.analyze_batch_folder(batch_folder)
-            for data in batch_data:
-                # Check if the batch already exists in the database
-                existing_batch = db.get_batch(data["batch_name"])
-                if existing_batch:
-                    # Update only the relevant fields
-                    db.update_batch(
-                        data["batch_name"],
-                        data["subfolder_count"],
-                        data["image_count"],
-                        existing_batch[4],  # Keep the existing attempts
-                        existing_batch[5],  # Keep the existing status
-                    )
-                else:
-                    # Insert the new batch into the database
-                    db.insert_batch(
-                        data["batch_name"],
-                        data["subfolder_count"],
-                        data["image_count"],
-                        "0",
-                        "PENDING",
-                    )
-        # Step 1: Fetch all batch names from the database
-        all_batches = db.get_all_batches()
-        all_batch_names = [batch[1] for batch in all_batches]
+            self.folder_path = batch_folder
+            # Each inventory is written as its scan finishes, only the
+            # counts are kept until all batches are reconciled
+            existing_folders = self.list_batch_folders(batch_folder)
+            db.sync_batches(
+                self.iter_batch_analyses(batch_folder, db), existing_folders
+            )
+            self.send_notification(("reset", db.get_all_batches()))
 
-        # Step 2: Check each batch name against the folder
-        folder_path = self.get_folder_path_from_db()
-        existing_folders = [
-            name
-            for name in os.listdir(folder_path)
-            if os.path.isdir(os.path.join(folder_path, name))
-        ]
+    def notify_changes(self, batch_names):
+        # Push the current rows of changed batches to the GUI
+        db = self.get_db()
+        rows = []
+        removed = []
+        for batch_name in batch_names:
+            batch = db.get_batch(batch_name)
+            if batch:
+                rows.append(batch)
+            else:
+                removed.append(batch_name)
+        if rows or removed:
+            self.send_notification(("batches", rows, removed))
 
-        for batch_name in all_batch_names:
-            if batch_name not in existing_folders:
-                # Step 3: Delete the entry from the database
-                db.delete_batch(batch_name)
-        db.close()
+    def send_notification(self, message):
+        if self.notify is None:
+            return
+        try:
+            self.notify.send(message)
+        except OSError:
+            # The GUI went away, keep watching without it
+            self.notify = None
 
     def get_folder_path_from_db(self):
-        db = self.get_db()
-        config = db.get_configuration()
-        db.close()
+        config = self.get_db().get_cached_configuration()
         return config[2] if config else None
 
-    def run(self):
-        self.db = DatabaseManager()
+    def start_observer(self):
+        self.observer = Observer()
+        self.observer.schedule(
+            self.event_handler, self.folder_path, recursive=True
+        )
+        self.observer.start()
+
+    def run(self, notify=None, ready=None):
+        # ready() is called once the database is up to date and the
+        # observer is watching
+        self.notify = notify
         folder_path = self.get_folder_path_from_db()
 
         # Wait until a valid folder is provided
@@ -83,49 +303,89 @@ class Watcher:
             folder_path = self.get_folder_path_from_db()
 
         # Once a valid folder is found, initialize the observer and schedule it
-        self.observer = Observer()
-        self.observer.schedule(self.event_handler, folder_path, recursive=True)
+        self.folder_path = folder_path
         # Analyze the folder and update the database
         self.update_db()
 
         try:
-            self.observer.start()
+            self.create_queue().start()
+            self.start_observer()
             print("Observer started with folder: " + folder_path)
             try:
+                if ready is not None:
+                    ready()
                 while True:
                     time.sleep(1)
+                    folder_path = self.get_folder_path_from_db()
+                    if (
+                        folder_path
+                        and folder_path != self.folder_path
+                        and os.path.exists(folder_path)
+                    ):
+                        # The root folder was reconfigured
+                        print("Observer moved to folder: " + folder_path)
+                        self.observer.stop()
+                        self.folder_path = folder_path
+                        self.start_observer()
+                        self.queue.put_root(full_scan=True)
+                    elif not self.observer.is_alive():
+                        # The emitter died (e.g. event buffer overflow)
+                        print("Observer stopped, restarting")
+                        self.start_observer()
+                        self.queue.put_root(full_scan=True)
             except KeyboardInterrupt:
                 self.observer.stop()
             self.observer.join()
+            self.queue.stop()
+            self.close_db()
         except Exception as e:
             # Handle the exception
             print(f"Error in watcher: {e}")
 
-    def analyze_batch_folder(self, batch_folder_path):
-        batch_data = []
-        for item in os.listdir(batch_folder_path):
-            item_path = os.path.join(batch_folder_path, item)
-            if os.path.isdir(item_path) and item.startswith("BATCH"):
-                subfolder_count = 0
-                image_count = self.recursive_image_count(item_path)
-                for subitem in os.listdir(item_path):
-                    subitem_path = os.path.join(item_path, subitem)
-                    if os.path.isdir(subitem_path):
-                        subfolder_count += 1
-                batch_data.append(
-                    {
-                        "batch_name": item,
-                        "subfolder_count": subfolder_count,
-                        "image_count": image_count,
-                    }
+    def list_batch_folders(self, batch_folder_path):
+        return [
+            item
+            for item in os.listdir(batch_folder_path)
+            if item.startswith("BATCH")
+            and os.path.isdir(os.path.join(batch_folder_path, item))
+        ]
+
+    def analyze_batch(self, item_path, known_dirs=None):
+        return scanner.analyze_batch(item_path, known_dirs)
+
+    def create_executor(self):
+        if config.WATCHER_SCAN_EXECUTOR == "process":
+            return ProcessPoolExecutor(config.WATCHER_SCAN_WORKERS)
+        return ThreadPoolExecutor(config.WATCHER_SCAN_WORKERS)
+
+    def iter_batch_analyses(self, batch_folder_path, db=None):
+        # Batches are scanned in parallel, with a bounded number in
+        # flight, and yielded as soon as each one finishes
+        with self.create_executor() as executor:
+            pending = set()
+            for item in self.list_batch_folders(batch_folder_path):
+                if len(pending) >= config.WATCHER_SCAN_MAX_IN_FLIGHT:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self.collect_analyses(done)
+                item_path = os.path.join(batch_folder_path, item)
+                known_dirs = db.get_directories(item) if db else None
+                pending.add(
+                    executor.submit(
+                        scanner.analyze_batch, item_path, known_dirs
+                    )
                 )
-        return batch_data
+            yield from self.collect_analyses(as_completed(pending))
+
+    def collect_analyses(self, futures):
+        for future in futures:
+            try:
+                yield future.result()
+            except OSError as e:
+                # Removed while scanning, the next event settles it
+                print(f"Error scanning batch: {e}")
+
+    def analyze_batch_folder(self, batch_folder_path, db=None):
+        return list(self.iter_batch_analyses(batch_folder_path, db))
 
     def recursive_image_count(self, path):
-        total = 0
-        for _, _, files in os.walk(path):
-            for file in files:
-                mime_type, _ = mimetypes.guess_type(file)
-                if mime_type and mime_type.startswith("image"):
-                    total += 1
-        return total
+        return scanner.count_images(path)
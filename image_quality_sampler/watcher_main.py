@@ -0,0 +1,93 @@
+"""Entry point of the watcher process.
+
+Only the watcher, the database and the scanner are imported here, never
+PyQt5 or the GUI, so a spawned (or frozen) watcher starts quickly and
+stays small. Run on its own it watches the configured root folder and
+keeps the database up to date without a GUI.
+"""
+import os
+import sys
+import time
+
+# Taken first, so the reported startup covers the imports below
+STARTED = time.perf_counter()
+
+from image_quality_sampler.watcher import Watcher  # noqa: E402
+
+
+def peak_memory():
+    # Peak resident set size in bytes, None where it can't be read
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        get_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        get_memory_info.argtypes = [
+            wintypes.HANDLE,
+            ctypes.POINTER(ProcessMemoryCounters),
+            wintypes.DWORD,
+        ]
+        get_current_process = ctypes.windll.kernel32.GetCurrentProcess
+        get_current_process.restype = wintypes.HANDLE
+        handle = get_current_process()
+        if not get_memory_info(handle, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def ready_message():
+    return (
+        "ready",
+        {
+            "pid": os.getpid(),
+            "startup": time.perf_counter() - STARTED,
+            "peak_memory": peak_memory(),
+        },
+    )
+
+
+def run(notify=None):
+    # Target of the watcher process, notify is the GUI end of the pipe
+    watcher = Watcher()
+
+    def ready():
+        # Sent once the initial scan is stored and events are watched, so
+        # the startup covers everything before the watcher is useful
+        message = ready_message()
+        if notify is None:
+            print(f"Watcher ready: {message[1]}")
+        else:
+            watcher.send_notification(message)
+
+    watcher.run(notify, ready)
+
+
+def main():  # pragma: no cover
+    run()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
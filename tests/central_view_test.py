@@ -0,0 +1,175 @@
+import os
+from multiprocessing import Pipe
+
+import pytest
+from PyQt5.QtCore import Qt
+
+from image_quality_sampler import config
+from image_quality_sampler.GUI.utils.notifications import WatcherListener
+from image_quality_sampler.GUI.views.central_view import CentralView
+from image_quality_sampler.GUI.widgets.table_widgets import BatchTableModel
+
+
+@pytest.fixture
+def db(mocker):
+    db = mocker.MagicMock()
+    db.get_configuration.return_value = None
+    db.get_all_batches.return_value = [
+        (1, "BATCH1", 2, 10, 0, "PENDING"),
+        (2, "BATCH2", 3, 20, 1, "PASSED"),
+    ]
+    return db
+
+
+def table_contents(window):
+    model = window.tableView.model()
+    return sorted(
+        tuple(model.index(row, col).data() for col in range(3))
+        for row in range(model.rowCount())
+    )
+
+
+def test_pushed_changes_update_the_table(qtbot, db):
+    receiver, sender = Pipe(duplex=False)
+    listener = WatcherListener(receiver)
+    window = CentralView(db, listener=listener)
+    qtbot.addWidget(window)
+    assert not hasattr(window, "update_timer")
+    listener.start()
+
+    sender.send(("reset", db.get_all_batches()))
+    qtbot.waitUntil(lambda: window.batch_model.rowCount() == 2)
+
+    sender.send(("batches", [(1, "BATCH1", 2, 11, 0, "PENDING")], ["BATCH2"]))
+    qtbot.waitUntil(lambda: window.batch_model.rowCount() == 1)
+    assert table_contents(window) == [("BATCH1", "2", "11")]
+    sender.close()
+
+
+def test_polls_without_listener(qtbot, db):
+    window = CentralView(db)
+    qtbot.addWidget(window)
+    assert window.update_timer.isActive()
+    window.update_view()
+    assert table_contents(window) == [
+        ("BATCH1", "2", "10"),
+        ("BATCH2", "3", "20"),
+    ]
+    assert window.startSampleButton.isEnabled()
+
+
+def test_only_changed_rows_are_signalled(qtbot, db):
+    model = BatchTableModel()
+    model.reset_batches(db.get_all_batches())
+    changed = []
+    model.dataChanged.connect(
+        lambda top, bottom: changed.append((top.row(), bottom.row()))
+    )
+    model.apply_batch_changes(
+        [
+            (1, "BATCH1", 2, 10, 0, "PENDING"),
+            (2, "BATCH2", 3, 20, 2, "REJECTED"),
+        ],
+        [],
+    )
+    assert changed == [(1, 1)]
+    index = model.index(1, 0)
+    assert index.data(Qt.BackgroundRole).color().name() == "#ff0000"
+    assert index.data(Qt.ForegroundRole).color().name() == "#ffffff"
+
+
+def test_reset_after_the_first_load_is_applied_as_changes(qtbot, db):
+    model = BatchTableModel()
+    resets = []
+    model.modelReset.connect(lambda: resets.append(True))
+    model.reset_batches(db.get_all_batches())
+    assert resets == [True]
+
+    changed = []
+    removed = []
+    model.dataChanged.connect(
+        lambda top, bottom: changed.append((top.row(), bottom.row()))
+    )
+    model.rowsRemoved.connect(
+        lambda parent, first, last: removed.append((first, last))
+    )
+    model.reset_batches(
+        [
+            (2, "BATCH2", 3, 25, 0, "PENDING"),
+            (3, "BATCH3", 1, 5, 0, "PENDING"),
+        ]
+    )
+    assert resets == [True]
+    assert removed == [(0, 0)]
+    assert changed == [(0, 0)]
+    assert model.batch_names() == ["BATCH2", "BATCH3"]
+
+
+def test_numeric_columns_sort_by_value(qtbot, db):
+    db.get_all_batches.return_value = [
+        (1, "BATCH1", 2, 9, 0, "PENDING"),
+        (2, "BATCH2", 3, 100, 1, "PASSED"),
+        (3, "BATCH3", 1, 20, 0, "PENDING"),
+    ]
+    window = CentralView(db)
+    qtbot.addWidget(window)
+    window.update_view()
+    window.tableView.sortByColumn(2, Qt.AscendingOrder)
+    model = window.tableView.model()
+    assert [model.index(row, 2).data() for row in range(3)] == [
+        "9",
+        "20",
+        "100",
+    ]
+
+    # Updates are placed by the proxy without resetting the sort
+    window.apply_batch_changes([(1, "BATCH1", 2, 500, 0, "PENDING")], [])
+    assert [model.index(row, 2).data() for row in range(3)] == [
+        "20",
+        "100",
+        "500",
+    ]
+
+
+def test_reports_are_generated_in_the_background(
+    qtbot, db, mocker, tmpdir, monkeypatch
+):
+    reports_dir = os.path.join(str(tmpdir), "reports")
+    monkeypatch.setattr(config, "REPORTS_DIR", reports_dir)
+    warning = mocker.patch(
+        "image_quality_sampler.GUI.views.central_view.QMessageBox.warning"
+    )
+    window = CentralView(db)
+    qtbot.addWidget(window)
+    assert not window.reportProgress.isVisibleTo(window)
+    data = {
+        "Batch Name": "BATCH1",
+        "Lot": 10,
+        "Documents": 2,
+        "Sample": 2,
+        "Sampling Plan": 1,
+        "Attempt": 2,
+        "Checked Images": ["BATCH1/doc1/page_0.tif", "BATCH1/doc1/page_1.tif"],
+        "Rejected Images": [],
+        "Project": "Project",
+        "Location": "Location",
+        "User 1": "A",
+        "User 2": "B",
+    }
+    with qtbot.waitSignal(
+        window.report_generator.report_finished, timeout=60000
+    ) as blocker:
+        future = window.generate_report(data)
+        # Returns right away, the report is written in a worker process
+        assert not future.done()
+        assert window.reportProgress.isVisibleTo(window)
+    batch_name, attempt, path = blocker.args
+    assert (batch_name, attempt) == ("BATCH1", 2)
+    assert os.path.dirname(path) == reports_dir
+    assert os.path.getsize(path) > 0
+    db.insert_report.assert_called_once_with("BATCH1", 2, path)
+    qtbot.waitUntil(lambda: not window.reportProgress.isVisibleTo(window))
+
+    with qtbot.waitSignal(window.report_generator.report_failed):
+        window.generate_report({"Batch Name": "BATCH2"})
+    qtbot.waitUntil(lambda: warning.called)
@@ -0,0 +1,197 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from PIL import Image
+
+import image_quality_sampler
+from image_quality_sampler import config
+from image_quality_sampler.__main__ import main
+from image_quality_sampler.db.database_manager import DatabaseManager
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(image_quality_sampler.__file__))
+
+
+def run(capsys, *argv):
+    code = main(list(argv))
+    out, err = capsys.readouterr()
+    return code, json.loads(out) if code == 0 else err
+
+
+@pytest.fixture
+def batch(tmpdir):
+    batch = os.path.join(str(tmpdir), "root", "BATCH1")
+    for folder in ["doc1", "doc2"]:
+        os.makedirs(os.path.join(batch, folder))
+        for i in range(5):
+            path = os.path.join(batch, folder, f"page_{i}.jpg")
+            Image.new("RGB", (10, 10)).save(path)
+    return batch
+
+
+def test_plan(capsys):
+    code, result = run(capsys, "plan", "9", "--level", "II", "--aql", "6.5")
+    assert code == 0
+    assert result["sample_size"] == 2
+    assert result["acceptance_number"] == 0
+    assert result["rejection_number"] == 1
+
+
+def test_plan_rejects_unknown_aql(capsys):
+    with pytest.raises(SystemExit):
+        main(["plan", "100", "--aql", "7"])
+
+
+def test_scan(capsys, batch, tmpdir, monkeypatch):
+    monkeypatch.setattr(
+        config, "DB_FILENAME", os.path.join(str(tmpdir), "test.db")
+    )
+    code, result = run(capsys, "scan", batch, "--store")
+    assert code == 0
+    assert result == [
+        {
+            "batch_name": "BATCH1",
+            "path": batch,
+            "subfolder_count": 2,
+            "image_count": 10,
+        }
+    ]
+    db = DatabaseManager()
+    assert db.get_batch("BATCH1")[2:4] == (2, 10)
+    db.close()
+
+
+def test_scan_rejects_missing_folders(capsys, batch, tmpdir, monkeypatch):
+    monkeypatch.setattr(
+        config, "DB_FILENAME", os.path.join(str(tmpdir), "test.db")
+    )
+    missing = os.path.join(os.path.dirname(batch), "NOPE")
+    code, error = run(capsys, "scan", batch, missing, "--store")
+    assert code == 1
+    assert "NOPE" in error
+    db = DatabaseManager()
+    assert db.get_all_batches() == []
+    db.close()
+
+
+def test_sample_is_repeatable(capsys, batch):
+    code, first = run(capsys, "sample", batch, "4")
+    assert code == 0
+    assert len(first["images"]) == 4
+    _, again = run(capsys, "sample", batch, "4", "--seed", str(first["seed"]))
+    assert again["images"] == first["images"]
+
+    code, error = run(capsys, "sample", batch, "11")
+    assert code == 1
+    assert "Sample larger than population" in error
+
+
+def test_report(capsys, batch):
+    images = [os.path.join(batch, "doc1", f"page_{i}.jpg") for i in range(3)]
+    session = {
+        "Batch Name": "BATCH1",
+        "Lot": 10,
+        "Documents": 2,
+        "Sample": 3,
+        "Sampling Plan": 1,
+        "Checked Images": images,
+        "Rejected Images": [[images[0], "Bad cropping"]],
+        "Project": "Project",
+        "Location": "Location",
+        "User 1": "A",
+        "User 2": "B",
+    }
+    with open("session.json", "w") as f:
+        json.dump(session, f)
+    code, result = run(capsys, "report", "session.json", "-o", "out.pdf")
+    assert code == 0
+    assert result["report"] == os.path.abspath("out.pdf")
+    assert os.path.getsize("out.pdf") > 0
+
+
+def test_report_without_batch_name(capsys):
+    with open("session.json", "w") as f:
+        json.dump({"Lot": 10, "Checked Images": []}, f)
+    code, error = run(capsys, "report", "session.json", "--store")
+    assert code == 1
+    assert "Batch Name" in error
+
+
+def test_report_is_named_and_recorded(capsys, tmpdir, monkeypatch):
+    monkeypatch.setattr(
+        config, "DB_FILENAME", os.path.join(str(tmpdir), "test.db")
+    )
+    monkeypatch.setattr(config, "REPORTS_DIR", str(tmpdir.join("reports")))
+    session = {
+        "Batch Name": "BATCH1",
+        "Lot": 10,
+        "Documents": 2,
+        "Sample": 3,
+        "Sampling Plan": 1,
+        "Attempt": 3,
+        "Checked Images": [],
+        "Rejected Images": [],
+        "User 1": "A",
+        "User 2": "B",
+    }
+    with open("session.json", "w") as f:
+        json.dump(session, f)
+    code, result = run(capsys, "report", "session.json", "--store")
+    assert code == 0
+    assert os.path.basename(result["report"]).startswith("BATCH1_attempt3_")
+    db = DatabaseManager()
+    assert [row[:2] for row in db.get_reports("BATCH1")] == [
+        (3, result["report"])
+    ]
+    db.close()
+
+
+def test_commands_do_not_import_qt():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-m",
+            "image_quality_sampler",
+            "plan",
+            "500",
+            "--aql",
+            "1.0",
+        ],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=PROJECT_ROOT),
+        check=True,
+    )
+    assert json.loads(result.stdout)["sample_size"] == 50
+    assert "PyQt5" not in result.stderr
+
+
+def test_sample_stays_out_of_the_gui_package(batch):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-m",
+            "image_quality_sampler",
+            "sample",
+            batch,
+            "3",
+        ],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=PROJECT_ROOT),
+        check=True,
+    )
+    assert len(json.loads(result.stdout)["images"]) == 3
+    imported = [
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    ]
+    for module in ["image_quality_sampler.GUI", "PyQt5", "PIL"]:
+        assert not [name for name in imported if name.startswith(module)]
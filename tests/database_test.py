@@ -0,0 +1,213 @@
+import os
+import sqlite3
+
+import pytest
+
+from image_quality_sampler import config
+from image_quality_sampler.db.database_manager import (
+    MIGRATIONS,
+    SCHEMA_VERSION,
+    DatabaseManager,
+)
+
+
+@pytest.fixture
+def db(tmpdir, monkeypatch):
+    monkeypatch.setattr(
+        config, "DB_FILENAME", os.path.join(str(tmpdir), "test.db")
+    )
+    db = DatabaseManager()
+    yield db
+    db.close()
+
+
+def scan_result(batch_name, subfolder_count, image_count):
+    return {
+        "batch_name": batch_name,
+        "subfolder_count": subfolder_count,
+        "image_count": image_count,
+        "directories": {batch_name: (None, 1, image_count)},
+        "images": {
+            batch_name: [
+                (os.path.join(batch_name, f"{i}.tif"), 10, 1, "image/tiff")
+                for i in range(image_count)
+            ]
+        },
+    }
+
+
+def test_sync_batches_inserts_and_updates(db):
+    db.sync_batches([scan_result("BATCH1", 1, 2), scan_result("BATCH2", 1, 3)])
+    db.update_batch("BATCH1", 1, 2, 1, "TEMP REJECTED")
+
+    db.sync_batches([scan_result("BATCH1", 2, 5)])
+    assert db.get_batch("BATCH1")[2:] == (2, 5, 1, "TEMP REJECTED")
+    assert db.get_batch("BATCH2")[2:] == (1, 3, 0, "PENDING")
+    assert len(db.get_directories("BATCH1")) == 1
+
+
+def test_sync_batches_prunes_missing_batches(db):
+    db.sync_batches([scan_result(f"BATCH{i}", 1, 1) for i in range(4)])
+    db.sync_batches([], ["BATCH0", "BATCH2"])
+    assert [batch[1] for batch in db.get_all_batches()] == [
+        "BATCH0",
+        "BATCH2",
+    ]
+    assert db.get_directories("BATCH1") == {}
+    db.cursor.execute("SELECT DISTINCT batch_name FROM images")
+    assert sorted(db.cursor.fetchall()) == [("BATCH0",), ("BATCH2",)]
+
+
+def test_sync_batches_rolls_back_on_error(db):
+    db.sync_batches([scan_result("BATCH1", 1, 1)])
+    broken = scan_result("BATCH2", 1, 1)
+    del broken["image_count"]
+    with pytest.raises(KeyError):
+        db.sync_batches([scan_result("BATCH3", 1, 1), broken])
+    assert [batch[1] for batch in db.get_all_batches()] == ["BATCH1"]
+    # Inventories are committed one batch at a time, the broken one is
+    # not written at all
+    assert db.get_directories("BATCH2") == {}
+
+
+def test_sync_batches_streams_scan_results(db):
+    seen = []
+
+    def scan_results():
+        yield scan_result("BATCH1", 1, 2)
+        # Seen from another connection before the next batch is scanned:
+        # the inventory is committed, the batch row comes at the end
+        other = DatabaseManager(read_only=True)
+        seen.append((other.get_directories("BATCH1"), other.get_all_batches()))
+        other.close()
+        yield scan_result("BATCH2", 1, 2)
+
+    db.sync_batches(scan_results())
+    assert seen == [({"BATCH1": (None, 1, 2)}, [])]
+    assert [batch[1:4] for batch in db.get_all_batches()] == [
+        ("BATCH1", 1, 2),
+        ("BATCH2", 1, 2),
+    ]
+
+
+def test_new_database_is_at_latest_version(db):
+    assert db.get_schema_version() == SCHEMA_VERSION
+    for table in [
+        "configuration",
+        "batches",
+        "directories",
+        "images",
+        "metadata_cache",
+        "samples",
+        "reports",
+    ]:
+        assert db.check_table_exists(table)
+
+
+def test_existing_database_is_upgraded_in_place(tmpdir, monkeypatch):
+    path = os.path.join(str(tmpdir), "old.db")
+    monkeypatch.setattr(config, "DB_FILENAME", path)
+    # Schema as created before migrations existed, with a duplicate row
+    conn = sqlite3.connect(path)
+    for statement in MIGRATIONS[0]:
+        conn.execute(statement)
+    conn.executemany(
+        """
+        INSERT INTO batches (batch_name, folder_count, image_count,
+        sampling_attempts, status)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [
+            ("BATCH1", 1, 10, 1, "PASSED"),
+            ("BATCH2", 2, 20, 0, "PENDING"),
+            ("BATCH1", 1, 10, 0, "PENDING"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager()
+    assert db.get_schema_version() == SCHEMA_VERSION
+    assert [batch[1:] for batch in db.get_all_batches()] == [
+        ("BATCH1", 1, 10, 1, "PASSED"),
+        ("BATCH2", 2, 20, 0, "PENDING"),
+    ]
+    with pytest.raises(sqlite3.IntegrityError):
+        db.insert_batch("BATCH1", 1, 10, 0, "PENDING")
+    db.close()
+
+    # Opening it again leaves everything as it is
+    db = DatabaseManager()
+    assert db.get_schema_version() == SCHEMA_VERSION
+    assert len(db.get_all_batches()) == 2
+    db.close()
+
+
+def test_connections_use_wal(db):
+    db.cursor.execute("PRAGMA journal_mode")
+    assert db.cursor.fetchone()[0] == "wal"
+    db.cursor.execute("PRAGMA busy_timeout")
+    assert db.cursor.fetchone()[0] == config.DB_BUSY_TIMEOUT
+
+
+def test_read_only_connection(db):
+    db.sync_batches([scan_result("BATCH1", 1, 2)])
+    reader = DatabaseManager(read_only=True)
+    # An open write transaction does not block readers
+    db.cursor.execute("DELETE FROM batches")
+    assert [batch[1] for batch in reader.get_all_batches()] == ["BATCH1"]
+    db.conn.rollback()
+    with pytest.raises(sqlite3.OperationalError):
+        reader.insert_batch("BATCH2", 1, 1, 0, "PENDING")
+    reader.close()
+
+
+def test_cached_configuration_follows_other_connections(db):
+    assert db.get_cached_configuration() is None
+    db.insert_configuration("Project", "Location", "/root/a")
+    assert db.get_cached_configuration()[2] == "/root/a"
+
+    other = DatabaseManager()
+    other.update_configuration("Project", "Location", "/root/b")
+    other.close()
+    assert db.get_cached_configuration()[2] == "/root/b"
+
+
+def test_metadata_cache(db, monkeypatch):
+    monkeypatch.setattr(config, "METADATA_CACHE_MAX_ROWS", 2)
+    metadata = {"DPI": (300, 300), "File type": "TIFF"}
+    db.store_cached_metadata("a.tif", 10, 1, metadata)
+    assert db.get_cached_metadata("a.tif", 10, 1) == metadata
+    # A changed file is a miss
+    assert db.get_cached_metadata("a.tif", 10, 2) is None
+    assert db.get_cached_metadata("a.tif", 11, 1) is None
+
+    db.store_cached_metadata("b.tif", 10, 1, metadata)
+    db.get_cached_metadata("a.tif", 10, 1)
+    db.store_cached_metadata("c.tif", 10, 1, metadata)
+    # b.tif was used least recently
+    db.cursor.execute("SELECT path FROM metadata_cache ORDER BY path")
+    assert db.cursor.fetchall() == [("a.tif",), ("c.tif",)]
+
+
+def test_samples_are_recorded(db):
+    db.insert_sample("BATCH1", 1, 2**62, 50)
+    db.insert_sample("BATCH1", 2, 7, 50)
+    db.insert_sample("BATCH2", 1, 8, 20)
+    assert [row[:3] for row in db.get_samples("BATCH1")] == [
+        (1, 2**62, 50),
+        (2, 7, 50),
+    ]
+
+
+def test_reports_are_recorded(db):
+    db.insert_report("BATCH1", 1, "/reports/BATCH1_attempt1_a.pdf")
+    db.insert_report("BATCH2", 1, "/reports/BATCH2_attempt1_a.pdf")
+    db.insert_report("BATCH1", 2, "/reports/BATCH1_attempt2_a.pdf")
+    # A path is never recorded for two reports
+    with pytest.raises(sqlite3.IntegrityError):
+        db.insert_report("BATCH1", 3, "/reports/BATCH1_attempt2_a.pdf")
+    assert [row[:2] for row in db.get_reports("BATCH1")] == [
+        (1, "/reports/BATCH1_attempt1_a.pdf"),
+        (2, "/reports/BATCH1_attempt2_a.pdf"),
+    ]
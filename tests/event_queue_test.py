@@ -0,0 +1,109 @@
+import threading
+import time
+
+from image_quality_sampler.event_queue import BatchEventQueue
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, changes, root_change):
+        self.calls.append((changes, root_change))
+
+
+def test_deltas_are_summed_per_batch():
+    recorder = Recorder()
+    queue = BatchEventQueue(recorder)
+    for _ in range(3):
+        queue.put("BATCH1", image_delta=1)
+    queue.put("BATCH1", folder_delta=1)
+    queue.put("BATCH2", image_delta=-1)
+    queue.flush()
+
+    changes, root_change = recorder.calls[0]
+    assert root_change is None
+    assert changes["BATCH1"]["image_delta"] == 3
+    assert changes["BATCH1"]["folder_delta"] == 1
+    assert changes["BATCH2"]["image_delta"] == -1
+    assert queue.stats() == {
+        "events_received": 5,
+        "rescans_performed": 2,
+        "flushes": 1,
+    }
+
+
+def test_removed_overrides_earlier_changes():
+    recorder = Recorder()
+    queue = BatchEventQueue(recorder)
+    queue.put("BATCH1", image_delta=4, rescan=True)
+    queue.put("BATCH1", removed=True)
+    queue.flush()
+    change = recorder.calls[0][0]["BATCH1"]
+    assert change["removed"]
+    assert not change["rescan"]
+    assert change["image_delta"] == 0
+
+
+def test_recreated_batch_is_rescanned():
+    recorder = Recorder()
+    queue = BatchEventQueue(recorder)
+    queue.put("BATCH1", removed=True)
+    queue.put("BATCH1", created=True)
+    queue.flush()
+    change = recorder.calls[0][0]["BATCH1"]
+    assert change["rescan"]
+    assert not change["removed"]
+
+
+def test_full_scan_discards_batch_changes():
+    recorder = Recorder()
+    queue = BatchEventQueue(recorder)
+    queue.put("BATCH1", image_delta=1)
+    queue.put_root(full_scan=True)
+    queue.put_root()
+    queue.flush()
+    assert recorder.calls == [({}, "full")]
+
+
+def test_empty_flush_does_nothing():
+    recorder = Recorder()
+    queue = BatchEventQueue(recorder)
+    queue.flush()
+    assert recorder.calls == []
+
+
+def test_quiet_window_coalesces_bursts():
+    recorder = Recorder()
+    queue = BatchEventQueue(recorder, quiet_window=0.2, max_latency=5)
+    queue.start()
+    for _ in range(10):
+        queue.put("BATCH1", image_delta=1)
+        time.sleep(0.01)
+    time.sleep(0.5)
+    queue.stop()
+    assert len(recorder.calls) == 1
+    assert recorder.calls[0][0]["BATCH1"]["image_delta"] == 10
+
+
+def test_max_latency_caps_waiting():
+    recorder = Recorder()
+    queue = BatchEventQueue(recorder, quiet_window=0.2, max_latency=0.3)
+    queue.start()
+    deadline = time.monotonic() + 1
+    while time.monotonic() < deadline:
+        queue.put("BATCH1", image_delta=1)
+        time.sleep(0.05)
+    queue.stop()
+    assert len(recorder.calls) >= 3
+
+
+def test_on_stop_runs_in_the_worker_thread():
+    threads = []
+    queue = BatchEventQueue(
+        Recorder(), on_stop=lambda: threads.append(threading.get_ident())
+    )
+    queue.start()
+    worker = queue.thread.ident
+    queue.stop()
+    assert threads == [worker]
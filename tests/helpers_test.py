@@ -0,0 +1,61 @@
+import builtins
+import datetime
+import os
+
+import exifread
+from PIL import Image
+
+from image_quality_sampler.GUI.utils.helpers import extract_image_metadata
+
+
+def test_metadata_from_exif(tmpdir, mocker):
+    path = os.path.join(str(tmpdir), "page.jpg")
+    exif = Image.Exif()
+    exif[0x010F] = "Scanner"  # Make
+    exif.get_ifd(0x8769)[0x9003] = "2024:01:02 03:04:05"  # DateTimeOriginal
+    Image.new("RGB", (60, 30)).save(path, dpi=(300, 300), exif=exif)
+    opened = mocker.spy(builtins, "open")
+    process_file = mocker.spy(exifread, "process_file")
+
+    metadata = extract_image_metadata(path)
+    assert metadata == {
+        "DPI": (300, 300),
+        "Color depth": "24bit RGB",
+        "File type": "JPEG",
+        "Size": "0.0 MB",
+        "Filename": "page.jpg",
+        "Date Created": "2024:01:02 03:04:05",
+        "Creation method": "Scanner",
+    }
+    assert opened.call_count == 1
+    assert process_file.call_args.kwargs["details"] is False
+
+
+def test_metadata_without_exif(tmpdir):
+    path = os.path.join(str(tmpdir), "page.tif")
+    Image.new("1", (60, 30)).save(path)
+    metadata = extract_image_metadata(path)
+    created = datetime.datetime.fromtimestamp(os.stat(path).st_ctime)
+    assert metadata["Color depth"] == "1bit 1"
+    assert metadata["File type"] == "TIFF"
+    assert metadata["Date Created"] == created.strftime("%Y-%m-%d %H:%M:%S")
+    assert metadata["Creation method"] == "None"
+
+
+def test_metadata_cache(tmpdir, mocker):
+    path = os.path.join(str(tmpdir), "page.png")
+    Image.new("RGB", (60, 30)).save(path)
+    cache = mocker.Mock()
+    cache.get_cached_metadata.return_value = None
+    metadata = extract_image_metadata(path, cache=cache)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    cache.get_cached_metadata.assert_called_once_with(*key)
+    cache.store_cached_metadata.assert_called_once_with(*key, metadata)
+
+    cache.get_cached_metadata.return_value = {"Filename": "page.png"}
+    opened = mocker.spy(builtins, "open")
+    assert extract_image_metadata(path, cache=cache) == {
+        "Filename": "page.png"
+    }
+    assert not opened.called
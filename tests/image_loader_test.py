@@ -0,0 +1,120 @@
+import os
+import threading
+
+import pytest
+from PIL import Image
+
+from image_quality_sampler.GUI.utils import image_loader
+from image_quality_sampler.GUI.utils.image_loader import (
+    ImageLoader,
+    decode_image,
+    decode_preview,
+    decode_region,
+    read_image_size,
+)
+
+
+@pytest.fixture
+def paths(tmpdir):
+    paths = []
+    for i in range(6):
+        path = os.path.join(str(tmpdir), f"image_{i}.png")
+        Image.new("RGB", (20 + i, 10)).save(path)
+        paths.append(path)
+    return paths
+
+
+def test_images_are_prefetched(qtbot, paths, mocker):
+    decode = mocker.Mock(side_effect=decode_image)
+    loader = ImageLoader(paths, prefetch_count=2, decode=decode)
+    assert loader.get(0).width() == 20
+    qtbot.waitUntil(lambda: not loader.futures)
+    assert sorted(loader.cache) == [1, 2]
+
+    decode.reset_mock()
+    assert loader.get(1).width() == 21
+    qtbot.waitUntil(lambda: not loader.futures)
+    # Served from the cache, only the next image is decoded
+    assert [call.args[0] for call in decode.call_args_list] == [paths[3]]
+    loader.shutdown()
+
+
+def test_waits_for_a_running_decode(qapp, paths):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def decode(path):
+        calls.append(path)
+        if path == paths[1]:
+            started.set()
+            release.wait(5)
+        return decode_image(path)
+
+    loader = ImageLoader(paths, prefetch_count=1, decode=decode)
+    loader.get(0)
+    started.wait(5)
+    threading.Timer(0.05, release.set).start()
+    assert loader.get(1).width() == 21
+    assert calls.count(paths[1]) == 1
+    loader.shutdown()
+
+
+def test_cache_is_bounded_by_memory(qtbot, paths):
+    size = decode_image(paths[5]).sizeInBytes()
+    loader = ImageLoader(paths, prefetch_count=5, max_bytes=2 * size)
+    loader.get(0)
+    qtbot.waitUntil(lambda: not loader.futures)
+    assert loader.cache_bytes <= 2 * size
+    assert sorted(loader.cache) == [1, 2]
+    # Dropped images are decoded again when they are reached
+    for index in range(1, 6):
+        assert loader.get(index).width() == 20 + index
+    loader.shutdown()
+
+
+def gradient(size):
+    image = Image.linear_gradient("L")
+    bands = (image, image.transpose(Image.ROTATE_90), image)
+    return Image.merge("RGB", bands).resize(size)
+
+
+def test_region_of_a_striped_tiff(tmpdir, mocker):
+    path = os.path.join(str(tmpdir), "striped.tif")
+    original = gradient((600, 400))
+    original.save(path, tiffinfo={278: 16})
+    box = (100, 150, 300, 180)
+    restrict = mocker.spy(image_loader, "restrict_to_region")
+    region = decode_region(path, box)
+    assert region.tobytes() == original.crop(box).tobytes()
+    # Only the strips covering rows 150 to 180 were kept
+    assert restrict.call_args.args[0].size == (600, 48)
+    assert restrict.spy_return == (100, 6, 300, 36)
+
+
+@pytest.mark.parametrize(
+    "name, mode, save_options",
+    [
+        ("page.jpg", "RGB", {}),
+        ("page.png", "RGB", {}),
+        ("striped.tif", "RGB", {"tiffinfo": {278: 16}}),
+        ("bilevel.tif", "1", {"tiffinfo": {278: 16}}),
+    ],
+)
+def test_preview_fits_the_screen(qapp, tmpdir, name, mode, save_options):
+    path = os.path.join(str(tmpdir), name)
+    gradient((1200, 800)).convert(mode).save(path, **save_options)
+    preview = decode_preview(path, (300, 300))
+    assert (preview.width(), preview.height()) == (300, 200)
+    assert read_image_size(path) == (1200, 800)
+
+
+def test_preview_uses_a_pyramid_level(qapp, tmpdir, mocker):
+    path = os.path.join(str(tmpdir), "pyramid.tif")
+    levels = [gradient((1600 // 2**i, 800 // 2**i)) for i in range(4)]
+    levels[0].save(path, save_all=True, append_images=levels[1:])
+    select = mocker.spy(image_loader, "select_pyramid_level")
+    preview = decode_preview(path, (300, 300))
+    assert (preview.width(), preview.height()) == (300, 150)
+    # The 400x200 level was decoded, not the full image
+    assert select.spy_return == 2
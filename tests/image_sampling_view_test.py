@@ -0,0 +1,115 @@
+import os
+
+import pytest
+from PIL import Image
+
+from image_quality_sampler import config
+from image_quality_sampler.GUI.utils.image_loader import crop_tiles
+from image_quality_sampler.GUI.views import image_sampling_view
+from image_quality_sampler.GUI.views.image_sampling_view import (
+    ImageSamplingView,
+)
+
+
+def create_view(qtbot, tmpdir, mocker, name, **save_options):
+    folder = os.path.join(str(tmpdir), "BATCH1")
+    os.makedirs(folder)
+    for i in range(2):
+        Image.new("RGB", (3000, 2000), "white").save(
+            os.path.join(folder, f"page_{i}.{name}"), **save_options
+        )
+    db = mocker.MagicMock()
+    db.get_batch.return_value = (1, "BATCH1", 1, 2, 0, "PENDING")
+    db.get_cached_metadata.return_value = None
+    view = ImageSamplingView(
+        folder, 2, 1, mocker.MagicMock(), db, "BATCH1", "A", "B"
+    )
+    qtbot.addWidget(view)
+    # Close without asking for confirmation
+    view.exit_flag = False
+    return view
+
+
+@pytest.fixture
+def view(qtbot, tmpdir, mocker, monkeypatch):
+    monkeypatch.setattr(config, "IMAGE_TILE_SIZE", 256)
+    return create_view(qtbot, tmpdir, mocker, "tif", tiffinfo={278: 64})
+
+
+def test_preview_is_shown_in_full_resolution_coordinates(view):
+    rect = view.graphics_scene.sceneRect()
+    assert (rect.width(), rect.height()) == (3000, 2000)
+    assert view.preview_width < 3000
+    assert not view.tiles
+
+
+def test_zoom_loads_visible_tiles_only(qtbot, view, mocker):
+    crop = mocker.spy(image_sampling_view, "crop_tiles")
+    view.zoom_1_1()
+    # Decoded on the loader's threads, not on the GUI thread
+    assert not view.tiles
+    qtbot.waitUntil(lambda: bool(view.tiles) and not view.pending_tiles)
+    assert crop.called
+    # 1:1 only shows part of a 3000x2000 image in the view
+    assert len(view.tiles) < (3000 // 256 + 1) * (2000 // 256 + 1)
+
+    view.zoom_fit()
+    view.load_visible_tiles()
+    assert not view.tiles
+    assert not view.pending_tiles
+
+
+def test_failed_tiles_are_tried_again(qtbot, view, mocker):
+    crop = mocker.patch.object(
+        image_sampling_view, "crop_tiles", side_effect=OSError("Broken")
+    )
+    view.zoom_1_1()
+    qtbot.waitUntil(lambda: not view.pending_tiles)
+    assert not view.tiles
+    crop.side_effect = crop_tiles
+    view.load_visible_tiles()
+    qtbot.waitUntil(lambda: bool(view.tiles) and not view.pending_tiles)
+
+
+def test_single_block_image_is_decoded_once(qtbot, tmpdir, mocker):
+    decode = mocker.spy(image_sampling_view, "decode_full_image")
+    view = create_view(qtbot, tmpdir, mocker, "jpg")
+    assert view.single_block
+    view.zoom_1_1()
+    qtbot.waitUntil(lambda: bool(view.tiles) and not view.pending_tiles)
+    first = set(view.tiles)
+    scroll_bar = view.graphics_view.horizontalScrollBar()
+    scroll_bar.setValue(scroll_bar.maximum())
+    qtbot.waitUntil(
+        lambda: bool(set(view.tiles) - first) and not view.pending_tiles
+    )
+    assert decode.call_count == 1
+
+    # The next image replaces the one kept
+    view.accept_image()
+    view.zoom_1_1()
+    qtbot.waitUntil(lambda: bool(view.tiles) and not view.pending_tiles)
+    assert decode.call_count == 2
+    assert view.full_image[0] == 1
+
+
+def test_sample_seed_is_recorded(view):
+    view.db.insert_sample.assert_called_once_with("BATCH1", 1, view.seed, 2)
+
+
+def test_report_is_generated_after_the_status_is_stored(view, mocker):
+    mocker.patch(
+        "image_quality_sampler.GUI.views.image_sampling_view"
+        ".QMessageBox.information"
+    )
+    calls = []
+    view.db.update_batch.side_effect = lambda *args: calls.append("status")
+    view.main_window.generate_report.side_effect = lambda data: calls.append(
+        "report"
+    )
+    view.accept_image()
+    view.accept_image()
+    assert calls == ["status", "report"]
+    data = view.main_window.generate_report.call_args.args[0]
+    assert data["Batch Name"] == "BATCH1"
+    assert data["Seed"] == view.seed
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import image_quality_sampler
+
+# Lets the child import the package from any working directory
+PROJECT_ROOT = os.path.dirname(os.path.dirname(image_quality_sampler.__file__))
+
+# Only needed once a sampling session starts or a report is made
+DEFERRED_MODULES = ["matplotlib", "reportlab", "exifread", "numpy", "PIL"]
+
+# Cumulative import time allowed for the GUI entry module, in
+# microseconds. Generous, it guards against heavy imports creeping back
+IMPORT_BUDGET = 800_000
+
+
+def import_times(module):
+    env = dict(
+        os.environ, QT_QPA_PLATFORM="offscreen", PYTHONPATH=PROJECT_ROOT
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.fixture(scope="module")
+def gui_import_times():
+    return import_times("image_quality_sampler.qt")
+
+
+@pytest.mark.parametrize("module", DEFERRED_MODULES)
+def test_heavy_modules_are_deferred(gui_import_times, module):
+    assert module not in gui_import_times
+
+
+def test_import_budget(gui_import_times):
+    assert gui_import_times["image_quality_sampler.qt"] < IMPORT_BUDGET
+
+
+def test_watcher_process_imports_no_gui():
+    times = import_times("image_quality_sampler.watcher_main")
+    assert "PyQt5" not in times
+    assert "image_quality_sampler.GUI" not in times
@@ -0,0 +1,65 @@
+import math
+
+import numpy as np
+import pytest
+
+from image_quality_sampler import sampling_plan
+from image_quality_sampler.reports import oc_curve
+
+PLANS = [(100, 13, 0), (1000, 80, 2), (5000, 200, 5), (50, 50, 1)]
+RATES = [0.0, 0.001, 0.01, 0.05, 0.2, 1.0]
+
+
+def binomial(n, c, p):
+    return sum(
+        math.comb(n, d) * p**d * (1 - p) ** (n - d) for d in range(c + 1)
+    )
+
+
+def hypergeometric(lot, n, c, p):
+    defects = round(p * lot)
+    return sum(
+        math.comb(defects, d) * math.comb(lot - defects, n - d)
+        for d in range(c + 1)
+    ) / math.comb(lot, n)
+
+
+@pytest.mark.parametrize("distribution", ["binomial", "hypergeometric"])
+def test_acceptance_matches_the_formulas(distribution):
+    lots, sample_sizes, acceptance_numbers = zip(*PLANS)
+    result = oc_curve.operating_characteristics(
+        lots, sample_sizes, acceptance_numbers, RATES, distribution
+    )
+    assert result["acceptance"].shape == (len(PLANS), len(RATES))
+    for i, (lot, n, c) in enumerate(PLANS):
+        for j, p in enumerate(RATES):
+            expected = (
+                binomial(n, c, p)
+                if distribution == "binomial"
+                else hypergeometric(lot, n, c, p)
+            )
+            assert result["acceptance"][i, j] == pytest.approx(expected)
+            assert result["aoq"][i, j] == pytest.approx(
+                p * expected * (lot - n) / lot
+            )
+            assert result["ati"][i, j] == pytest.approx(
+                n + (1 - expected) * (lot - n)
+            )
+
+
+def test_plan_arrays_follow_the_sampling_plan():
+    lots = np.array([1, 2, 9, 1000, 5000, 600000])
+    covered, sample_sizes, acceptance_numbers = oc_curve.plan_arrays(
+        lots, "II", "0.65"
+    )
+    assert covered.tolist() == [2, 9, 1000, 5000, 600000]
+    for lot, n, c in zip(covered, sample_sizes, acceptance_numbers):
+        expected = sampling_plan.get_sample_size_and_acceptance(
+            int(lot), "II", "0.65"
+        )
+        assert (n, c) == expected[:2]
+
+
+def test_unknown_distribution():
+    with pytest.raises(ValueError):
+        oc_curve.operating_characteristics([10], [2], [0], RATES, "poisson")
@@ -0,0 +1,58 @@
+import pytest
+
+from image_quality_sampler import sampling_plan
+from image_quality_sampler.GUI.utils.helpers import SamplingPlan
+
+
+@pytest.mark.parametrize(
+    "lot_size, level, aql, expected",
+    [
+        (2, "II", "1.0", (2, 0, 1)),
+        (8, "II", "0.065", (8, 0, 1)),
+        (9, "II", "6.5", (2, 0, 1)),
+        (1000, "II", "1.0", (80, 2, 3)),
+        (1200, "II", "1.0", (80, 2, 3)),
+        (1201, "II", "1.0", (125, 3, 4)),
+        (600000, "II", "2.5", (500, 21, 22)),
+        (600000, "I", "0.10", (500, 1, 2)),
+    ],
+)
+def test_lookup(lot_size, level, aql, expected):
+    assert (
+        sampling_plan.get_sample_size_and_acceptance(lot_size, level, aql)
+        == expected
+    )
+    assert (
+        SamplingPlan().get_sample_size_and_acceptance(lot_size, level, aql)
+        == expected
+    )
+
+
+def test_missing_rejection_number_is_filled_in():
+    # Code letter Q (1250) at AQL 0.65 lacked its rejection number
+    assert sampling_plan.get_sample_size_and_acceptance(
+        600000, "II", "0.65"
+    ) == (1250, 14, 15)
+
+
+def test_outside_the_tables():
+    assert sampling_plan.get_sample_size_and_acceptance(1, "II", "1.0") == (
+        None,
+        None,
+        None,
+    )
+    assert sampling_plan.get_sample_size_and_acceptance(1000, "II", "99") == (
+        None,
+        None,
+        None,
+    )
+    with pytest.raises(KeyError):
+        sampling_plan.get_sample_size_and_acceptance(1000, "IV", "1.0")
+
+
+def test_tables_are_read_only():
+    with pytest.raises(TypeError):
+        sampling_plan.PLANS["A", "1.0"] = (1, 1, 1)
+    assert sampling_plan.LOT_MINIMUMS == tuple(
+        sorted(sampling_plan.LOT_MINIMUMS)
+    )
@@ -0,0 +1,110 @@
+import collections
+import os
+import random
+
+import pytest
+
+from image_quality_sampler import scanner
+
+
+def create_tree(root):
+    files = [
+        os.path.join("doc1", "page_1.tif"),
+        os.path.join("doc1", "page_2.TIFF"),
+        os.path.join("doc1", "notes.txt"),
+        os.path.join("doc2", "nested", "page_1.jpg"),
+        "cover.png",
+        "Thumbs.db",
+    ]
+    for name in files:
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"data")
+    return root
+
+
+def test_is_image():
+    assert scanner.is_image("page.tif")
+    assert scanner.is_image("PAGE.JPG")
+    assert not scanner.is_image("notes.txt")
+    assert not scanner.is_image("page.tif", frozenset({".jpg"}))
+
+
+def test_iter_and_count_images(tmpdir):
+    root = create_tree(str(tmpdir))
+    images = sorted(scanner.iter_images(root))
+    assert images == sorted(
+        os.path.join(root, name)
+        for name in [
+            os.path.join("doc1", "page_1.tif"),
+            os.path.join("doc1", "page_2.TIFF"),
+            os.path.join("doc2", "nested", "page_1.jpg"),
+            "cover.png",
+        ]
+    )
+    assert scanner.count_images(root) == 4
+    assert scanner.count_images(root, frozenset({".png"})) == 1
+
+
+def test_ordered_walk(tmpdir):
+    root = create_tree(str(tmpdir))
+    images = list(scanner.iter_images(root, ordered=True))
+    assert images == [
+        os.path.join(root, name)
+        for name in [
+            "cover.png",
+            os.path.join("doc1", "page_1.tif"),
+            os.path.join("doc1", "page_2.TIFF"),
+            os.path.join("doc2", "nested", "page_1.jpg"),
+        ]
+    ]
+
+
+def test_missing_folder_counts_nothing(tmpdir):
+    assert scanner.count_images(os.path.join(str(tmpdir), "missing")) == 0
+
+
+def test_scan_tree_reuses_unchanged_folders(tmpdir, mocker):
+    create_tree(os.path.join(str(tmpdir), "BATCH1"))
+    directories, images = scanner.scan_tree(str(tmpdir), "BATCH1")
+    assert sum(count for _, _, count in directories.values()) == 4
+    assert directories["BATCH1"][0] is None
+    assert images[os.path.join("BATCH1", "doc1")][0][3] == "image/tiff"
+
+    scandir = mocker.spy(os, "scandir")
+    rescanned, relisted = scanner.scan_tree(str(tmpdir), "BATCH1", directories)
+    assert rescanned == directories
+    assert relisted == {}
+    assert scandir.call_count == 0
+
+
+def test_reservoir_sample_is_uniform():
+    rng = random.Random(1)
+    counts = collections.Counter()
+    for _ in range(2000):
+        sample = scanner.reservoir_sample(iter(range(100)), 10, rng)
+        assert len(set(sample)) == 10
+        counts.update(sample)
+    # Every item is expected 200 times
+    assert min(counts.values()) > 140
+    assert max(counts.values()) < 260
+
+
+def test_reservoir_sample_sizes():
+    assert sorted(scanner.reservoir_sample(range(5), 5)) == [0, 1, 2, 3, 4]
+    assert scanner.reservoir_sample(range(5), 0) == []
+    with pytest.raises(ValueError):
+        scanner.reservoir_sample(range(5), 6)
+
+
+def test_seeded_samples_can_be_drawn_again(tmpdir):
+    for folder in ["doc1", "doc2"]:
+        os.makedirs(os.path.join(str(tmpdir), folder))
+        for i in range(50):
+            path = os.path.join(str(tmpdir), folder, f"page_{i}.tif")
+            open(path, "wb").close()
+    sample = scanner.select_random_images(str(tmpdir), 10, seed=42)
+    assert len(set(sample)) == 10
+    assert scanner.select_random_images(str(tmpdir), 10, seed=42) == sample
+    assert scanner.select_random_images(str(tmpdir), 10, seed=43) != sample
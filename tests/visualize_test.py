@@ -0,0 +1,171 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+import image_quality_sampler
+from image_quality_sampler import config
+from image_quality_sampler.reports import visualize
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(image_quality_sampler.__file__))
+
+
+def session(tmpdir):
+    images = []
+    for i in range(3):
+        path = os.path.join(str(tmpdir), "BATCH1", f"page_{i}.tif")
+        images.append(path)
+    return {
+        "Batch Name": "BATCH1",
+        "Lot": 100,
+        "Documents": 2,
+        "Sample": 20,
+        "Sampling Plan": 2,
+        "Attempt": 1,
+        "Checked Images": images,
+        "Rejected Images": [(images[0], "Bad cropping")],
+        "Project": "Project",
+        "Location": "Location",
+        "User 1": "A",
+        "User 2": "B",
+    }
+
+
+@pytest.fixture
+def reports_dir(tmpdir, monkeypatch):
+    reports_dir = os.path.join(str(tmpdir), "reports")
+    monkeypatch.setattr(config, "REPORTS_DIR", reports_dir)
+    return reports_dir
+
+
+def test_report_includes_the_oc_curve(tmpdir, reports_dir, mocker):
+    charts = mocker.spy(visualize, "generate_charts")
+    output = visualize.create_report(session(tmpdir))
+    assert os.path.dirname(output) == reports_dir
+    assert os.path.basename(output).startswith("BATCH1_attempt1_")
+    assert os.path.getsize(output) > 0
+    oc_buffer = charts.spy_return[2]
+    oc_buffer.seek(0)
+    assert Image.open(oc_buffer).format == "PNG"
+
+
+def test_engine_renders_many_reports(tmpdir, mocker):
+    engine = visualize.ReportEngine()
+    font = mocker.spy(visualize, "TTFont")
+    styles = mocker.spy(visualize, "getSampleStyleSheet")
+    sessions = [session(tmpdir), dict(session(tmpdir), Lot=200)]
+    outputs = engine.render_many(sessions, ["first.pdf", "second.pdf"])
+    assert outputs == [
+        os.path.abspath("first.pdf"),
+        os.path.abspath("second.pdf"),
+    ]
+    assert all(os.path.getsize(output) > 0 for output in outputs)
+    # Set up once, when the engine was created
+    assert font.call_count == 0
+    assert styles.call_count == 0
+
+
+def test_engine_needs_an_output_per_session(tmpdir):
+    with pytest.raises(ValueError):
+        visualize.ReportEngine().render_many([session(tmpdir)], [])
+
+
+def test_report_names_do_not_clobber(tmpdir, reports_dir):
+    now = datetime(2024, 5, 6, 7, 8, 9)
+    names = visualize.report_names(session(tmpdir), now=now)
+    assert next(names) == os.path.join(
+        reports_dir, "BATCH1_attempt1_20240506_070809.pdf"
+    )
+    assert next(names) == os.path.join(
+        reports_dir, "BATCH1_attempt1_20240506_070809_1.pdf"
+    )
+
+
+def test_concurrent_reports_get_names_of_their_own(tmpdir, reports_dir):
+    now = datetime(2024, 5, 6, 7, 8, 9)
+    os.makedirs(reports_dir)
+
+    def publish(number):
+        temp_path = os.path.join(reports_dir, f"{number}.tmp")
+        with open(temp_path, "w") as f:
+            f.write(str(number))
+        names = visualize.report_names(session(tmpdir), now=now)
+        return visualize.publish(temp_path, names)
+
+    with ThreadPoolExecutor(8) as executor:
+        paths = list(executor.map(publish, range(16)))
+    assert len(set(paths)) == 16
+    assert sorted(os.listdir(reports_dir)) == sorted(
+        os.path.basename(path) for path in paths
+    )
+    for number, path in enumerate(paths):
+        with open(path) as f:
+            assert f.read() == str(number)
+
+
+def test_crash_leaves_no_report(tmpdir, reports_dir):
+    # The process dies while the PDF is being written
+    script = f"""
+import os
+from image_quality_sampler.reports import visualize
+
+def build(self, data, filename):
+    with open(filename, "wb") as f:
+        f.write(b"%PDF-1.4")
+    os._exit(9)
+
+visualize.ReportEngine.build = build
+visualize.ReportEngine().render(
+    {{"Batch Name": "BATCH1", "Attempt": 2}}, reports_dir={reports_dir!r}
+)
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env=dict(os.environ, PYTHONPATH=PROJECT_ROOT),
+    )
+    assert result.returncode == 9
+    names = os.listdir(reports_dir)
+    assert names
+    assert all(name.endswith(".tmp") for name in names)
+
+
+def test_failed_report_leaves_no_file(tmpdir, reports_dir, mocker):
+    mocker.patch.object(
+        visualize, "generate_charts", side_effect=RuntimeError("Broken")
+    )
+    with pytest.raises(RuntimeError):
+        visualize.create_report(session(tmpdir), "report.pdf")
+    # Neither the report nor its temporary file is left behind
+    assert not [name for name in os.listdir() if ".pdf" in name]
+    # Nor the name reserved for a named report
+    with pytest.raises(RuntimeError):
+        visualize.create_report(session(tmpdir))
+    assert os.listdir(reports_dir) == []
+
+
+def test_charts_leave_no_figures_behind(tmpdir, mocker):
+    for chart in [
+        visualize.pie_chart,
+        visualize.bar_chart,
+        visualize.oc_chart,
+    ]:
+        chart.cache_clear()
+    canvas = mocker.spy(visualize, "FigureCanvasAgg")
+    render = mocker.spy(visualize, "render_figure")
+    for lot in [100, 101, 102]:
+        pie, bar, oc = visualize.generate_charts(
+            dict(session(tmpdir), Lot=lot)
+        )
+        assert Image.open(pie).size == Image.open(oc).size == (800, 600)
+    assert "matplotlib.pyplot" not in sys.modules
+    # Every figure was cleared once its chart was saved
+    figures = [call.args[0] for call in canvas.call_args_list]
+    assert len(figures) == render.call_count == 9
+    assert not any(figure.axes for figure in figures)
+    # The same numbers again are served from the cache
+    visualize.generate_charts(dict(session(tmpdir), Lot=100))
+    assert render.call_count == 3 * 3
@@ -0,0 +1,33 @@
+from multiprocessing import Pipe
+
+from image_quality_sampler import watcher_main
+from image_quality_sampler.GUI.utils.notifications import WatcherListener
+from image_quality_sampler.watcher import Watcher
+
+
+def test_ready_is_sent_once_watching(mocker):
+    receiver, sender = Pipe(duplex=False)
+
+    def run(watcher, notify, ready):
+        # Nothing is sent before the watcher says it is watching
+        assert notify is sender
+        assert not receiver.poll()
+        watcher.notify = notify
+        ready()
+
+    mocker.patch.object(Watcher, "run", autospec=True, side_effect=run)
+    watcher_main.run(sender)
+    kind, info = receiver.recv()
+    assert kind == "ready"
+    assert info["startup"] > 0
+    assert info["peak_memory"] > 0
+
+
+def test_listener_reports_readiness(qtbot):
+    receiver, sender = Pipe(duplex=False)
+    listener = WatcherListener(receiver)
+    listener.start()
+    with qtbot.waitSignal(listener.watcher_ready) as blocker:
+        sender.send(watcher_main.ready_message())
+    assert set(blocker.args[0]) == {"pid", "startup", "peak_memory"}
+    sender.close()
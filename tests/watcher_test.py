@@ -0,0 +1,340 @@
+import os
+import shutil
+from multiprocessing import Pipe
+
+import pytest
+from PIL import Image
+from watchdog.events import (
+    DirCreatedEvent,
+    DirDeletedEvent,
+    DirModifiedEvent,
+    DirMovedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileMovedEvent,
+)
+
+from image_quality_sampler import config
+from image_quality_sampler.db.database_manager import DatabaseManager
+from image_quality_sampler.watcher import Watcher
+
+
+def create_image(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", (10, 10)).save(path)
+
+
+@pytest.fixture
+def root(tmpdir, monkeypatch):
+    monkeypatch.setattr(
+        config, "DB_FILENAME", os.path.join(str(tmpdir), "test.db")
+    )
+    root = os.path.join(str(tmpdir), "root")
+    for batch in ["BATCH1", "BATCH2"]:
+        for folder in ["doc1", "doc2"]:
+            for i in range(3):
+                create_image(
+                    os.path.join(root, batch, folder, f"image_{i}.jpg")
+                )
+    db = DatabaseManager()
+    db.insert_configuration("Project", "Location", root)
+    db.close()
+    return root
+
+
+@pytest.fixture
+def watcher(root):
+    watcher = Watcher()
+    watcher.update_db()
+    watcher.create_queue()
+    return watcher
+
+
+def get_counts(batch_name):
+    db = DatabaseManager()
+    batch = db.get_batch(batch_name)
+    db.close()
+    return (batch[2], batch[3]) if batch else None
+
+
+def test_full_scan(watcher):
+    assert get_counts("BATCH1") == (2, 6)
+    assert get_counts("BATCH2") == (2, 6)
+
+
+def test_event_path_maps_to_batch(watcher, root):
+    path = os.path.join(root, "BATCH1", "doc1", "image_0.jpg")
+    assert watcher.get_batch_name(path) == "BATCH1"
+    assert watcher.get_batch_name(root) is None
+    assert watcher.get_batch_name(os.path.join(root, "other")) is None
+
+
+def test_file_events_adjust_counts(watcher, root, mocker):
+    rescan = mocker.spy(watcher, "analyze_batch")
+    path = os.path.join(root, "BATCH1", "doc1", "new.jpg")
+    create_image(path)
+    watcher.on_created(FileCreatedEvent(path))
+    watcher.queue.flush()
+    assert get_counts("BATCH1") == (2, 7)
+
+    dest = os.path.join(root, "BATCH2", "doc1", "new.jpg")
+    os.rename(path, dest)
+    watcher.on_moved(FileMovedEvent(path, dest))
+    watcher.queue.flush()
+    assert get_counts("BATCH1") == (2, 6)
+    assert get_counts("BATCH2") == (2, 7)
+
+    os.remove(dest)
+    watcher.on_deleted(FileDeletedEvent(dest))
+    watcher.queue.flush()
+    assert get_counts("BATCH2") == (2, 6)
+    assert not rescan.called
+
+
+def get_images(batch_name):
+    db = DatabaseManager()
+    db.cursor.execute(
+        """
+        SELECT path, directory, size, mtime, file_type FROM images
+        WHERE batch_name = ?
+        """,
+        (batch_name,),
+    )
+    images = set(db.cursor.fetchall())
+    db.close()
+    return images
+
+
+def test_file_events_keep_the_inventory(watcher, root, tmpdir):
+    path = os.path.join(root, "BATCH1", "doc1", "new.jpg")
+    create_image(path)
+    watcher.on_created(FileCreatedEvent(path))
+    os.remove(os.path.join(root, "BATCH1", "doc1", "image_0.jpg"))
+    watcher.on_deleted(
+        FileDeletedEvent(os.path.join(root, "BATCH1", "doc1", "image_0.jpg"))
+    )
+    # A folder with images moved in from outside the root
+    outside = os.path.join(str(tmpdir), "outside")
+    for i in range(3):
+        create_image(os.path.join(outside, f"page_{i}.jpg"))
+    folder = os.path.join(root, "BATCH2", "doc3")
+    shutil.move(outside, folder)
+    watcher.on_created(DirCreatedEvent(folder))
+    for name in os.listdir(folder):
+        watcher.on_created(FileCreatedEvent(os.path.join(folder, name)))
+    watcher.queue.flush()
+    assert get_counts("BATCH1") == (2, 6)
+    assert get_counts("BATCH2") == (3, 9)
+    batch1, batch2 = get_images("BATCH1"), get_images("BATCH2")
+    assert len(batch1) == 6
+    assert len(batch2) == 9
+
+    # The same rows a scan finds
+    watcher.update_db()
+    assert get_images("BATCH1") == batch1
+    assert get_images("BATCH2") == batch2
+
+
+def test_non_image_files_are_ignored(watcher, root):
+    path = os.path.join(root, "BATCH1", "doc1", "notes.txt")
+    open(path, "w").close()
+    watcher.on_created(FileCreatedEvent(path))
+    watcher.queue.flush()
+    assert get_counts("BATCH1") == (2, 6)
+
+
+def test_folder_events(watcher, root):
+    path = os.path.join(root, "BATCH1", "doc3")
+    os.makedirs(path)
+    watcher.on_created(DirCreatedEvent(path))
+    watcher.queue.flush()
+    assert get_counts("BATCH1") == (3, 6)
+
+    dest = os.path.join(root, "BATCH1", "doc4")
+    os.rename(path, dest)
+    watcher.on_moved(DirMovedEvent(path, dest))
+    watcher.queue.flush()
+    assert get_counts("BATCH1") == (3, 6)
+
+    # A removed folder is rescanned since its contents are unknown
+    removed = os.path.join(root, "BATCH1", "doc1")
+    for name in os.listdir(removed):
+        os.remove(os.path.join(removed, name))
+    os.rmdir(removed)
+    watcher.on_deleted(DirDeletedEvent(removed))
+    watcher.queue.flush()
+    assert get_counts("BATCH1") == (2, 3)
+
+
+def test_batch_folder_events(watcher, root):
+    path = os.path.join(root, "BATCH3")
+    os.makedirs(path)
+    watcher.on_created(DirCreatedEvent(path))
+    watcher.queue.flush()
+    assert get_counts("BATCH3") == (0, 0)
+
+    watcher.on_deleted(DirDeletedEvent(os.path.join(root, "BATCH2")))
+    watcher.queue.flush()
+    assert get_counts("BATCH2") is None
+
+
+def test_copied_batch_is_counted_once(watcher, root):
+    # A batch folder copied in with its contents: the root listing
+    # changes and every file and folder in it is reported as well
+    batch = os.path.join(root, "BATCH3")
+    paths = [os.path.join(batch, "doc1", f"image_{i}.jpg") for i in range(4)]
+    for path in paths:
+        create_image(path)
+    watcher.on_created(DirCreatedEvent(batch))
+    watcher.on_modified(DirModifiedEvent(root))
+    watcher.on_created(DirCreatedEvent(os.path.join(batch, "doc1")))
+    for path in paths:
+        watcher.on_created(FileCreatedEvent(path))
+    watcher.queue.flush()
+    assert get_counts("BATCH3") == (1, 4)
+
+
+def test_events_are_coalesced_per_batch(watcher, root, mocker):
+    update = mocker.spy(watcher, "adjust_batch_counts")
+    for i in range(5):
+        path = os.path.join(root, "BATCH1", "doc1", f"new_{i}.jpg")
+        create_image(path)
+        watcher.on_created(FileCreatedEvent(path))
+    watcher.queue.flush()
+    assert get_counts("BATCH1") == (2, 11)
+    assert update.call_count == 1
+    assert watcher.queue.events_received == 5
+    assert watcher.queue.rescans_performed == 1
+
+
+def test_failed_update_requests_full_scan(watcher, root, mocker):
+    mocker.patch.object(
+        watcher, "adjust_batch_counts", side_effect=OSError("lost")
+    )
+    path = os.path.join(root, "BATCH1", "doc1", "image_0.jpg")
+    watcher.on_created(FileCreatedEvent(path))
+    watcher.queue.flush()
+    assert watcher.queue.root_change == "full"
+
+
+def test_inventory_is_stored(watcher, root):
+    db = DatabaseManager()
+    directories = db.get_directories("BATCH1")
+    db.cursor.execute(
+        "SELECT path, size, file_type FROM images WHERE batch_name = ?",
+        ("BATCH1",),
+    )
+    images = db.cursor.fetchall()
+    db.close()
+    assert set(directories) == {
+        "BATCH1",
+        os.path.join("BATCH1", "doc1"),
+        os.path.join("BATCH1", "doc2"),
+    }
+    assert len(images) == 6
+    assert all(
+        size > 0 and file_type == "image/jpeg" for _, size, file_type in images
+    )
+
+
+def test_unchanged_folders_are_not_listed(watcher, root, mocker):
+    scandir = mocker.spy(os, "scandir")
+    watcher.update_db()
+    assert scandir.call_count == 0
+
+    create_image(os.path.join(root, "BATCH1", "doc1", "new.jpg"))
+    watcher.update_db()
+    assert scandir.call_count == 1
+    assert get_counts("BATCH1") == (2, 7)
+
+    os.remove(os.path.join(root, "BATCH1", "doc2", "image_0.jpg"))
+    os.remove(os.path.join(root, "BATCH1", "doc2", "image_1.jpg"))
+    watcher.update_db()
+    assert get_counts("BATCH1") == (2, 5)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_parallel_batch_analysis(root, monkeypatch, executor):
+    for i in range(3, 6):
+        create_image(os.path.join(root, f"BATCH{i}", "doc1", "page.jpg"))
+    monkeypatch.setattr(config, "WATCHER_SCAN_EXECUTOR", executor)
+    monkeypatch.setattr(config, "WATCHER_SCAN_WORKERS", 2)
+    monkeypatch.setattr(config, "WATCHER_SCAN_MAX_IN_FLIGHT", 2)
+    batch_data = Watcher().analyze_batch_folder(root)
+    counts = {
+        data["batch_name"]: (data["subfolder_count"], data["image_count"])
+        for data in batch_data
+    }
+    assert counts == {
+        "BATCH1": (2, 6),
+        "BATCH2": (2, 6),
+        "BATCH3": (1, 1),
+        "BATCH4": (1, 1),
+        "BATCH5": (1, 1),
+    }
+
+
+def test_connection_is_reused(watcher, root, mocker):
+    connect = mocker.spy(DatabaseManager, "__init__")
+    watcher.get_folder_path_from_db()
+    watcher.update_db()
+    path = os.path.join(root, "BATCH1", "doc1", "new.jpg")
+    create_image(path)
+    watcher.on_created(FileCreatedEvent(path))
+    watcher.queue.flush()
+    assert not connect.called
+    assert get_counts("BATCH1") == (2, 7)
+
+
+def test_connections_are_closed(watcher, root, mocker):
+    close = mocker.spy(DatabaseManager, "close")
+    main_db = watcher.get_db()
+    watcher.queue.start()
+    path = os.path.join(root, "BATCH1", "doc1", "new.jpg")
+    create_image(path)
+    watcher.on_created(FileCreatedEvent(path))
+    watcher.queue.stop()
+    # The worker closed its own connection when the queue stopped
+    assert close.call_count == 1
+    assert close.call_args[0][0] is not main_db
+    watcher.close_db()
+    assert close.call_count == 2
+    assert close.call_args[0][0] is main_db
+    assert get_counts("BATCH1") == (2, 7)
+
+
+def test_ready_once_scanned_and_watching(root, mocker):
+    watcher = Watcher()
+    state = {}
+
+    def ready():
+        state["counts"] = get_counts("BATCH1")
+        state["watching"] = watcher.observer.is_alive()
+        # Stops run() the way Ctrl+C does
+        raise KeyboardInterrupt
+
+    watcher.run(ready=ready)
+    assert state == {"counts": (2, 6), "watching": True}
+    assert not watcher.observer.is_alive()
+
+
+def test_changes_are_pushed_to_the_gui(watcher, root):
+    receiver, sender = Pipe(duplex=False)
+    watcher.notify = sender
+    path = os.path.join(root, "BATCH1", "doc1", "new.jpg")
+    create_image(path)
+    watcher.on_created(FileCreatedEvent(path))
+    shutil.rmtree(os.path.join(root, "BATCH2"))
+    watcher.on_deleted(DirDeletedEvent(os.path.join(root, "BATCH2")))
+    watcher.queue.flush()
+
+    kind, rows, removed = receiver.recv()
+    assert kind == "batches"
+    assert [row[1:4] for row in rows] == [("BATCH1", 2, 7)]
+    assert removed == ["BATCH2"]
+
+    watcher.update_db()
+    kind, rows = receiver.recv()
+    assert kind == "reset"
+    assert [row[1] for row in rows] == ["BATCH1"]
+    assert not receiver.poll()